@@ -1,62 +1,223 @@
+import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
+from numba import njit
 from strategy import SniperStrategy
 import config
 import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger("Backtest")
 
-def fetch_history(symbol, days=7):
-    """Fetch history for N days using pagination (Binance limit 1000 candles)"""
-    all_dfs = []
-    current_end = None
+BINANCE_KLINES_URL = "https://api.binance.com/api/v3/klines"
+CANDLE_MS = 5 * 60 * 1000  # 5m candles
+CANDLES_PER_DAY = 288
+
+# On-disk candle cache (only the columns used downstream)
+CACHE_DIR = ".cache"
+CACHE_COLUMNS = ['open_time', 'open', 'high', 'low', 'close']
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+# FP32 is enough for Binance price precision and halves the memory scanned by the indicators
+PRICE_DTYPE = np.float32
+
+# Keep-alive session shared by all page requests, with retries on transient errors
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(
+    pool_maxsize=10,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+
+def _fetch_klines_page(params: dict):
+    """Fetch one page of klines. Returns the raw list or None on failure."""
+    try:
+        r = _session.get(BINANCE_KLINES_URL, params=params, timeout=(3, 5))
+        data = r.json()
+    except requests.RequestException as e:
+        logger.warning(f"Klines request failed ({params.get('symbol')}): {e}")
+        return None
     
-    print(f"Fetching {days} days for {symbol}...", end=" ", flush=True)
+    if not data or not isinstance(data, list):
+        return None
+    return data
+
+
+def _fetch_pages(symbol: str, now_ms: int, pages: int) -> list:
+    """Fetch 'pages' x 1000 candles back from now_ms concurrently. Returns raw rows, oldest first."""
+    # Page windows are known up front: each page covers 1000 candles back from 'now'
+    params_list = [
+        {"symbol": symbol, "interval": "5m", "limit": 1000, "endTime": now_ms - page * 1000 * CANDLE_MS}
+        for page in range(pages)
+    ]
     
-    for _ in range(10): 
-        print(".", end="", flush=True)
-        url = "https://api.binance.com/api/v3/klines"
-        params = {"symbol": symbol, "interval": "5m", "limit": 1000}
-        if current_end:
-            params['endTime'] = current_end
-            
-        try:
-            r = requests.get(url, params=params, timeout=5)
-            data = r.json()
-        except:
-            break
-            
-        if not data or not isinstance(data, list): break
-        
-        oldest_ts = data[0][0]
-        current_end = oldest_ts - 1
-        
-        df = pd.DataFrame(data, columns=[
-            'open_time', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_volume', 'trades', 'taker_buy_base',
-            'taker_buy_quote', 'ignore'
-        ])
-        all_dfs.append(df)
+    # Fire all pages concurrently over the shared keep-alive session
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(_fetch_klines_page, params_list))
+    
+    pages_data = []
+    for data in results:
+        # Stop at the first missing page to avoid gaps in the history
+        if not data: break
+        pages_data.append(data)
+    
+    # Oldest page first; pages share at most the boundary candle, drop it as we go
+    all_rows = []
+    seen = set()
+    for data in reversed(pages_data):
+        data = [row for row in data if row[0] not in seen]
+        seen.update(row[0] for row in data)
+        all_rows.extend(data)
+    return all_rows
+
+
+def _fetch_since(symbol: str, start_ms: int, max_pages: int = 10) -> list:
+    """Fetch all candles with open_time >= start_ms (paginating forward). Returns raw rows."""
+    all_rows = []
+    for _ in range(max_pages):
+        params = {"symbol": symbol, "interval": "5m", "limit": 1000, "startTime": start_ms}
+        data = _fetch_klines_page(params)
+        if not data: break
         
-        start_date = pd.to_datetime(oldest_ts, unit='ms')
-        if (pd.Timestamp.now() - start_date).days > days:
-            break
+        all_rows.extend(data)
+        if len(data) < 1000: break
+        start_ms = data[-1][0] + 1
+    return all_rows
+
+
+def _rows_to_df(all_rows: list) -> pd.DataFrame:
+    """Unique, oldest-first kline rows -> DataFrame with CACHE_COLUMNS (open_time kept as int ms)."""
+    if not all_rows:
+        return pd.DataFrame(columns=CACHE_COLUMNS)
+    
+    # Only open_time + OHLC are used downstream; drop the other 7 kline fields up front
+    df = pd.DataFrame([row[:5] for row in all_rows], columns=CACHE_COLUMNS)
+    
+    df[PRICE_COLUMNS] = df[PRICE_COLUMNS].astype(PRICE_DTYPE)
+    df['open_time'] = df['open_time'].astype(np.int64)
+    return df
+
+
+def _cache_path(symbol: str) -> str:
+    return os.path.join(CACHE_DIR, f"{symbol}_5m.parquet")
+
+
+def _load_cache(symbol: str):
+    path = _cache_path(symbol)
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable cache {path}: {e}")
+        return None
+
+
+def fetch_history(symbol, days=7):
+    """
+    Fetch history for N days using pagination (Binance limit 1000 candles).
+    Candles are cached in .cache/<symbol>_5m.parquet; later runs only fetch the missing tail.
+    Returns open_time as int64 milliseconds.
+    """
+    print(f"Fetching {days} days for {symbol}...", end=" ", flush=True)
+    
+    now_ms = int(time.time() * 1000)
+    pages = min(10, days * CANDLES_PER_DAY // 1000 + 1)
+    window_start = now_ms - pages * 1000 * CANDLE_MS
+    
+    cached = _load_cache(symbol)
+    if cached is not None and not cached.empty and cached['open_time'].min() <= window_start <= cached['open_time'].max():
+        # Refetch from the last cached candle too, it may have been saved while still open
+        last_ts = int(cached['open_time'].max())
+        new_df = _rows_to_df(_fetch_since(symbol, last_ts))
+        if not new_df.empty:
+            # Both sides are sorted; the refetched candles replace the cached ones from last_ts on
+            cached = cached[cached['open_time'] < new_df['open_time'].iat[0]]
+        else:
+            # The refetch always includes last_ts, so nothing back means the request failed
+            logger.warning(f"Tail refresh for {symbol} returned no candles; using cached data up to {last_ts}")
+        df = pd.concat([cached, new_df], ignore_index=True)
+        df[PRICE_COLUMNS] = df[PRICE_COLUMNS].astype(PRICE_DTYPE, copy=False)
+    else:
+        df = _rows_to_df(_fetch_pages(symbol, now_ms, pages))
             
     print(" Done.")
-    if not all_dfs: return pd.DataFrame()
+    if df.empty: return pd.DataFrame()
+    
+    # Only keep the window (plus one candle so a rerun a few minutes later still hits the cache)
+    df = df[df['open_time'] > window_start - CANDLE_MS].reset_index(drop=True)
+    
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        df.to_parquet(_cache_path(symbol), compression='snappy', index=False)
+    except Exception as e:
+        logger.warning(f"Could not write cache for {symbol}: {e}")
+    
+    # open_time stays as int64 ms (use .view('datetime64[ms]') only when printing)
+    return df[df['open_time'] > window_start].reset_index(drop=True)
+
+
+@njit(cache=True)
+def simulate_positions(signals_int, closes, times_int64, start_idx=25, hold_candles=3):
+    """
+    Position state machine for one asset (compiled with numba).
+    signals_int: 1 = UP, -1 = DOWN, 0 = NEUTRAL
+    Each position is closed after 'hold_candles' bars.
+    
+    Returns: (trades_ts, trades_side, trades_won, trades_entry, trades_exit) trimmed to the trade count
+    """
+    n = len(signals_int)
+    trades_ts = np.empty(n, dtype=np.int64)
+    trades_side = np.empty(n, dtype=np.int8)
+    trades_won = np.empty(n, dtype=np.bool_)
+    trades_entry = np.empty(n, dtype=np.float64)
+    trades_exit = np.empty(n, dtype=np.float64)
+    count = 0
+    
+    position_side = 0
+    entry_price = 0.0
+    candles_held = 0
     
-    final_df = pd.concat(all_dfs[::-1], ignore_index=True)
-    final_df = final_df.drop_duplicates(subset=['open_time']).sort_values('open_time')
+    for i in range(start_idx, n):
+        if position_side != 0:
+            candles_held += 1
+            
+            if candles_held >= hold_candles:
+                exit_price = closes[i]
+                if position_side == 1:
+                    won = exit_price > entry_price
+                else:
+                    won = exit_price < entry_price
+                
+                trades_ts[count] = times_int64[i]
+                trades_side[count] = position_side
+                trades_won[count] = won
+                trades_entry[count] = entry_price
+                trades_exit[count] = exit_price
+                count += 1
+                
+                position_side = 0
+        
+        elif signals_int[i] != 0:
+            position_side = signals_int[i]
+            entry_price = closes[i]
+            candles_held = 0
     
-    final_df['close'] = final_df['close'].astype(float)
-    final_df['open'] = final_df['open'].astype(float)
-    final_df['high'] = final_df['high'].astype(float)
-    final_df['low'] = final_df['low'].astype(float)
-    final_df['open_time'] = pd.to_datetime(final_df['open_time'], unit='ms')
-    return final_df
+    return (trades_ts[:count], trades_side[:count], trades_won[:count],
+            trades_entry[:count], trades_exit[:count])
+
+
+# One row per closed trade (asset/side encoded as small ints)
+TRADE_DTYPE = np.dtype([
+    ('ts', 'i8'), ('asset', 'i1'), ('side', 'i1'), ('won', '?'), ('entry', 'f8'), ('exit', 'f8')
+])
 
 
 def calculate_stake(portfolio_value: float, base: float = 20.0, min_stake: float = 5.0, max_stake: float = 50.0) -> float:
@@ -69,6 +230,10 @@ def calculate_stake(portfolio_value: float, base: float = 20.0, min_stake: float
     return max(min_stake, min(stake, max_stake))
 
 
+# calculate_stake() precomputed for whole-dollar portfolios (stake only depends on floor(portfolio))
+_STAKE_LUT = np.clip(np.floor(np.arange(0, 100000) / 20.0), 5.0, 50.0).astype(np.float64)
+
+
 def run_backtest_dynamic():
     """
     Run backtest with DYNAMIC stake sizing.
@@ -83,7 +248,8 @@ def run_backtest_dynamic():
     trades = 0
     
     # Collect all trades across all assets with timestamps to process chronologically
-    all_trades = []
+    asset_names = list(config.ASSETS.keys())
+    asset_trades = []
     
     print(f"\n{'='*60}")
     print(f"BACKTEST REPORT - DYNAMIC STAKES (Last 7 Days)")
@@ -92,67 +258,50 @@ def run_backtest_dynamic():
     print(f"{'='*60}")
 
     # First pass: collect all signals with timestamps
-    for asset, asset_config in config.ASSETS.items():
+    for asset_id, (asset, asset_config) in enumerate(config.ASSETS.items()):
         symbol = asset_config['binance_symbol']
         
         df = fetch_history(symbol, days=7)
         print(f"Loaded {len(df)} candles for {asset}")
+        if df.empty:
+            continue
         strategy = SniperStrategy(asset)
         
-        position = None
-        start_idx = 25
+        # Indicators/signals for every bar in one vectorized pass
+        signals = strategy.vectorized_signals(df, polymarket_up_odds=0.50)
+        signals_int = np.where(signals == 'UP', 1, np.where(signals == 'DOWN', -1, 0)).astype(np.int8)
+        closes = df['close'].to_numpy(dtype=PRICE_DTYPE)
+        times = df['open_time'].to_numpy(dtype=np.int64)
         
-        for i in range(start_idx, len(df)):
-            history_window = df.iloc[:i+1]
-            current_bar = df.iloc[i]
-            
-            res = strategy.analyze_market(history_window, polymarket_up_odds=0.50)
-            signal = res['signal']
-            
-            if position:
-                position['candles_held'] += 1
-                
-                if position['candles_held'] >= 3:
-                    exit_price = current_bar['close']
-                    entry_price = position['entry_price']
-                    
-                    won = False
-                    if position['side'] == 'UP':
-                        won = exit_price > entry_price
-                    else:
-                        won = exit_price < entry_price
-                    
-                    all_trades.append({
-                        'timestamp': current_bar['open_time'],
-                        'asset': asset,
-                        'side': position['side'],
-                        'won': won,
-                        'entry_price': entry_price,
-                        'exit_price': exit_price
-                    })
-                    
-                    position = None
-            
-            elif signal != 'NEUTRAL':
-                position = {
-                    'side': signal,
-                    'entry_price': current_bar['close'],
-                    'time': current_bar['open_time'],
-                    'candles_held': 0
-                }
+        ts, sides, won, entries, exits = simulate_positions(signals_int, closes, times)
+        
+        trades_arr = np.empty(len(ts), dtype=TRADE_DTYPE)
+        trades_arr['ts'] = ts
+        trades_arr['asset'] = asset_id
+        trades_arr['side'] = sides
+        trades_arr['won'] = won
+        trades_arr['entry'] = entries
+        trades_arr['exit'] = exits
+        asset_trades.append(trades_arr)
 
-    # Sort trades chronologically
-    all_trades.sort(key=lambda x: x['timestamp'])
+    # Sort trades chronologically (stable: ties keep asset order)
+    all_trades = np.concatenate(asset_trades) if asset_trades else np.empty(0, dtype=TRADE_DTYPE)
+    all_trades = all_trades[np.argsort(all_trades['ts'], kind='stable')]
     
     print(f"\nTotal Signals: {len(all_trades)}")
     print(f"\n--- Simulating with Dynamic Stakes ---\n")
     
     # Second pass: simulate with dynamic stakes
+    # (progress lines are buffered and written once after the loop)
+    log_lines = []
+    lut_max = len(_STAKE_LUT) - 1
     for trade in all_trades:
-        current_stake = calculate_stake(portfolio)
+        # Same as calculate_stake(portfolio); below $0 clamps to the min stake, above the table to the max
+        current_stake = _STAKE_LUT[min(max(int(portfolio), 0), lut_max)]
         
         # PnL based on current stake
-        if trade['won']:
+        trade_won = bool(trade['won'])
+        if trade_won:
             # Win: Get back stake + 80% profit (simulating 0.55 odds)
             pnl = current_stake * 0.8
             wins += 1
@@ -164,11 +313,15 @@ def run_backtest_dynamic():
         portfolio += pnl
         trades += 1
         
-        outcome = "WIN" if trade['won'] else "LOSS"
+        outcome = "WIN" if trade_won else "LOSS"
         
         # Print some trades to show progression
         if trades % 100 == 0 or trades <= 10 or trades >= len(all_trades) - 5:
-            print(f"Trade #{trades}: {trade['asset']} {trade['side']} | Stake: ${current_stake:.0f} | {outcome} | PnL: ${pnl:.2f} | Portfolio: ${portfolio:.2f}")
+            side = 'UP' if trade['side'] == 1 else 'DOWN'
+            log_lines.append(f"Trade #{trades}: {asset_names[trade['asset']]} {side} | Stake: ${current_stake:.0f} | {outcome} | PnL: ${pnl:.2f} | Portfolio: ${portfolio:.2f}")
+    
+    if log_lines:
+        sys.stdout.write('\n'.join(log_lines) + '\n')
 
     print(f"\n{'='*60}")
     print(f"FINAL PORTFOLIO: ${portfolio:.2f}")
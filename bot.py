@@ -16,14 +16,28 @@ import os
 import config
 from execution import ExecutionEngine
 from strategy import SwingStrategy
+import indicators_numba
+from price_feed import BinanceKlineFeed
 import pandas as pd
-import requests
+from http_utils import SESSION
 from datetime import datetime, timezone
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("PolymarketBot")
 
+# Entry window bounds in "minutes remaining" (constant for the whole run)
+_MIN_REMAINING = config.MARKET_TIMEFRAME_MINUTES - config.ENTRY_WINDOW_END_MIN
+_MAX_REMAINING = config.MARKET_TIMEFRAME_MINUTES - config.ENTRY_WINDOW_START_MIN
+
+# Sizing percentages for the startup banner
+_POSITION_PCT = getattr(config, 'POSITION_SIZE_PCT', 0.05) * 100
+_MAX_EXPOSURE_PCT = getattr(config, 'MAX_TOTAL_EXPOSURE_PCT', 0.10) * 100
+_FRACTIONAL_KELLY = getattr(config, 'FRACTIONAL_KELLY', 0.25)
+
+# Shortest gap between stream-driven cycles (each cycle makes REST calls)
+MIN_CYCLE_SECS = 2
+
 # Global flag for graceful shutdown
 running = True
 
@@ -31,6 +45,8 @@ def signal_handler(sig, frame):
     global running
     logger.info("Stopping bot...")
     running = False
+    if _price_feed is not None:
+        _price_feed.stop()  # Also wakes the main loop if it is waiting on the stream
 
 signal.signal(signal.SIGINT, signal_handler)
 
@@ -44,27 +60,54 @@ def fetch_price_history(symbol: str) -> pd.DataFrame:
         "limit": 50
     }
     try:
-        r = requests.get(url, params=params, timeout=5)
+        r = SESSION.get(url, params=params, timeout=5)
         data = r.json()
         if not isinstance(data, list):
             logger.error(f"Binance API error for {symbol}: {data}")
             return pd.DataFrame()
         
-        df = pd.DataFrame(data, columns=[
-            'open_time', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_volume', 'trades', 'taker_buy_base',
-            'taker_buy_quote', 'ignore'
-        ])
-        df['close'] = df['close'].astype(float)
-        df['open'] = df['open'].astype(float)
-        df['high'] = df['high'].astype(float)
-        df['low'] = df['low'].astype(float)
+        # Only open_time + OHLC are used downstream
+        df = pd.DataFrame([row[:5] for row in data], columns=['open_time', 'open', 'high', 'low', 'close'])
+        float_cols = ['open', 'high', 'low', 'close']
+        df[float_cols] = df[float_cols].astype(float)
         return df
     except Exception as e:
         logger.error(f"Failed to fetch {symbol} prices: {e}")
         return pd.DataFrame()
 
 
+# Best-ask extractor, specialized on the first order book we see
+# (the book type is fixed by the installed py_clob_client version)
+_ask_extractor = None
+
+
+def _make_ask_extractor(book):
+    if hasattr(book, 'asks'):
+        return lambda b: float(b.asks[0].price) if b.asks else None
+    return lambda b: float(b['asks'][0]['price']) if b.get('asks') else None
+
+
+def extract_best_ask(book):
+    """Best ask price of an order book, or None if there are no asks."""
+    global _ask_extractor
+    if _ask_extractor is None:
+        _ask_extractor = _make_ask_extractor(book)
+    return _ask_extractor(book)
+
+
+# Live kline stream (started in main); None -> REST polling only
+_price_feed = None
+
+
+def get_live_history(symbol: str) -> pd.DataFrame:
+    """5m candles from the WebSocket feed, falling back to REST if the stream has no fresh data."""
+    if _price_feed is not None:
+        df = _price_feed.get_history(symbol)
+        if df is not None:
+            return df
+    return fetch_price_history(symbol)
+
+
 def get_polymarket_odds(client, token_id: str) -> float:
     """
     Get current odds (best ask price) for a Polymarket token.
@@ -72,16 +115,35 @@ def get_polymarket_odds(client, token_id: str) -> float:
     """
     try:
         book = client.get_order_book(token_id)
-        if hasattr(book, 'asks') and book.asks:
-            return float(book.asks[0].price)
-        elif isinstance(book, dict) and 'asks' in book and book['asks']:
-            return float(book['asks'][0]['price'])
+        best_ask = extract_best_ask(book)
+        if best_ask is not None:
+            return best_ask
         return 0.50  # Default neutral
     except Exception as e:
         logger.warning(f"Failed to get odds: {e}")
         return 0.50
 
 
+def get_entry_stake(risk_manager: RiskManager, result: dict, best_ask: float) -> float:
+    """USD stake for a signal: its confidence as win probability, the entry ask as odds."""
+    return risk_manager.get_dynamic_stake(win_prob=result['confidence'], odds=best_ask)
+
+
+def wait_for_next_cycle(timeout: float, closed_only: bool):
+    """
+    Block until the kline stream has new data (any update, or only a closed candle)
+    or 'timeout' seconds pass. Falls back to a plain sleep without a stream.
+    Cycles woken by ticks are spaced at least MIN_CYCLE_SECS apart.
+    """
+    if _price_feed is None:
+        time.sleep(timeout)
+        return
+    if not closed_only:
+        time.sleep(MIN_CYCLE_SECS)
+        timeout = max(0.0, timeout - MIN_CYCLE_SECS)
+    _price_feed.wait_for_update(timeout, closed_only=closed_only)
+
+
 def get_minutes_to_expiry(market: dict) -> int:
     """
     Calculate minutes remaining until market expiry.
@@ -100,9 +162,7 @@ def get_minutes_to_expiry(market: dict) -> int:
 
 def is_in_entry_window(minutes_remaining: int) -> bool:
     """Check if we are in the valid entry window."""
-    min_remaining = 15 - config.ENTRY_WINDOW_END_MIN
-    max_remaining = 15 - config.ENTRY_WINDOW_START_MIN
-    return min_remaining <= minutes_remaining <= max_remaining
+    return _MIN_REMAINING <= minutes_remaining <= _MAX_REMAINING
 
 def check_daily_maintenance(engine: ExecutionEngine):
     """
@@ -137,17 +197,15 @@ def check_daily_maintenance(engine: ExecutionEngine):
 
 
 def main():
-    global running
+    global running, _price_feed
     
     logger.info("=" * 60)
     logger.info("    POLYMARKET SWING BOT v4.0 (BTC+ETH)")
     logger.info("=" * 60)
     logger.info(f"Assets: {list(config.ASSETS.keys())}")
     logger.info(f"Capital: ${config.INITIAL_CAPITAL:.2f}")
-    position_pct = getattr(config, 'POSITION_SIZE_PCT', 0.05) * 100
-    max_exposure_pct = getattr(config, 'MAX_TOTAL_EXPOSURE_PCT', 0.10) * 100
-    logger.info(f"Position Size: {position_pct:.0f}% per trade (${config.INITIAL_CAPITAL * position_pct/100:.2f})")
-    logger.info(f"Max Exposure: {max_exposure_pct:.0f}% total (2 positions)")
+    logger.info(f"Position Size: up to {_POSITION_PCT:.0f}% per trade (${config.INITIAL_CAPITAL * _POSITION_PCT/100:.2f}), reduced by {_FRACTIONAL_KELLY:g}x Kelly")
+    logger.info(f"Max Exposure: {_MAX_EXPOSURE_PCT:.0f}% total (2 positions)")
     logger.info(f"Entry Window: Minutes {config.ENTRY_WINDOW_START_MIN}-{config.ENTRY_WINDOW_END_MIN}")
     logger.info("=" * 60)
 
@@ -162,8 +220,20 @@ def main():
     scanner = MarketScanner()
     risk_manager = RiskManager()
     
-    # Create per-asset strategies
+    # Create per-asset strategies (compile their numba kernels now, not on the first tick)
     strategies = {asset: SwingStrategy(asset) for asset in config.ASSETS.keys()}
+    indicators_numba.warmup()
+    
+    # Stream 5m candles instead of polling Binance REST every cycle
+    try:
+        _price_feed = BinanceKlineFeed(
+            [asset_config['binance_symbol'] for asset_config in config.ASSETS.values()],
+            seed_fn=fetch_price_history
+        )
+        _price_feed.start()
+    except Exception as e:
+        logger.warning(f"Kline stream unavailable, using REST polling: {e}")
+        _price_feed = None
     
     cycle_count = 0
     
@@ -239,7 +309,7 @@ def main():
             
             # 3. Fetch price data
             symbol = asset_config['binance_symbol']
-            history = fetch_price_history(symbol)
+            history = get_live_history(symbol)
             
             if history.empty:
                 logger.warning(f"[{asset}] No price data available")
@@ -265,7 +335,7 @@ def main():
             
             logger.info(f"[{asset}] SIGNAL: {signal} | RSI={result['rsi']:.1f} | Div={result['divergence']:.1f}%")
             
-            # 6. Get dynamic stake and check risk
+            # 6. Check risk at the base stake (the final stake is Kelly-sized at the entry price)
             position_size = risk_manager.get_dynamic_stake()
             if not risk_manager.can_open_position(position_size, asset):
                 logger.warning(f"[{asset}] Risk manager blocked trade")
@@ -290,17 +360,21 @@ def main():
                 # 8. Get best price
                 try:
                     book = engine.client.get_order_book(token_id)
-                    best_ask = 0.99
+                    best_ask = extract_best_ask(book)
                     
-                    if hasattr(book, 'asks') and book.asks:
-                        best_ask = float(book.asks[0].price)
-                    elif isinstance(book, dict) and 'asks' in book and book['asks']:
-                        best_ask = float(book['asks'][0]['price'])
-                    else:
+                    if best_ask is None:
                         logger.warning(f"[{asset}] No asks, using fallback price")
                         best_ask = 0.50
                     
-                    # 9. Calculate size
+                    # 9. Calculate size (fractional Kelly on the signal's confidence at this price)
+                    position_size = get_entry_stake(risk_manager, result, best_ask)
+                    if position_size <= 0:
+                        logger.info(f"[{asset}] No Kelly edge at ${best_ask:.3f} (confidence {result['confidence']:.2f}), skipping")
+                        continue
+                    if not risk_manager.can_open_position(position_size, asset):
+                        logger.warning(f"[{asset}] Risk manager blocked trade")
+                        continue
+                    
                     size_shares = round(position_size / best_ask, 2)
                     estimated_cost = size_shares * best_ask
                     
@@ -320,7 +394,7 @@ def main():
                         logger.info(f"[{asset}] ORDER PLACED: {order_id}")
                         
                         # Get current spot price for reference
-                        current_spot = history['close'].iloc[-1] if not history.empty else 0
+                        current_spot = history['close'].iat[-1] if not history.empty else 0
                         
                         # For DOWN bets, resistance is the key level (price going above invalidates)
                         # For UP bets, support is the key level (price going below invalidates)
@@ -358,18 +432,21 @@ def main():
             else:
                 logger.warning("Execution engine unavailable")
         
-        # Sleep between cycles - shorter when monitoring active positions
+        # Wait for the next cycle - driven by the kline stream, with the old
+        # 15s/60s cadence as the upper bound (and the only clock without a stream)
         if running:
             if risk_manager.active_positions:
-                # Active positions: check every 15 seconds for faster TP/SL reaction
-                logger.info(f"Monitoring {len(risk_manager.active_positions)} position(s)... [15s cycle]")
-                time.sleep(15)
+                # Active positions: wake on every price update for fast TP/SL reaction
+                logger.info(f"Monitoring {len(risk_manager.active_positions)} position(s)... [next price update, max 15s]")
+                wait_for_next_cycle(timeout=15, closed_only=False)
             else:
-                # No positions: normal 60 second cycle
-                logger.info("Sleeping 60s...")
-                time.sleep(60)
+                # No positions: wake when a candle closes (new signal possible)
+                logger.info("Waiting for next candle close (max 60s)...")
+                wait_for_next_cycle(timeout=60, closed_only=True)
 
     
+    if _price_feed is not None:
+        _price_feed.stop()
     logger.info("Bot stopped.")
 
 
@@ -51,6 +51,7 @@ TAKE_PROFIT_PCT = 0.30  # Exit at 30% profit on position
 POSITION_SIZE_PCT = 0.05  # 5% of cash per position
 MAX_TOTAL_EXPOSURE_PCT = 0.10  # Max 10% total exposure (2 positions * 5%)
 MIN_STAKE = 1.0  # Minimum $1 to avoid dust trades
+FRACTIONAL_KELLY = 0.25  # Bet 1/4 of full Kelly when sizing from win probability + odds
 
 
 # Time Management
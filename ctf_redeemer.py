@@ -3,8 +3,13 @@ Polymarket CTF Redeem Script
 Calls redeemPositions on the Conditional Tokens Framework contract.
 """
 from web3 import Web3
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import config
+from http_utils import SESSION
+import json
 import logging
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +17,35 @@ logger = logging.getLogger(__name__)
 CTF_ADDRESS = "0x4D97DCd97eC945f40cF65F87097ACe5EA0476045"
 USDC_ADDRESS = "0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174"  # USDC on Polygon
 
+# Use multiple RPC options for reliability (raced at startup, fastest wins)
+RPC_URLS = [
+    "https://polygon.llamarpc.com",
+    "https://polygon-bor-rpc.publicnode.com",
+    "https://polygon-rpc.com"
+]
+RPC_PROBE_TIMEOUT = 3  # Startup race only
+RPC_TIMEOUT = 30  # Provider calls (eth_call, send, receipt polls)
+RECEIPT_POLL_LATENCY = 2  # ~Polygon block time; web3's 0.1s default hammers the RPC
+GAS_PRICE_TTL = 15  # Seconds a fetched gas price is reused across redeems
+NONCE_TTL = 30  # Re-read the pending nonce after this long (other txs may have used it)
+
+# payoutDenominator(bytes32) calldata is built by hand: selector + condition id
+PAYOUT_DENOMINATOR_SELECTOR = bytes(Web3.keccak(text="payoutDenominator(bytes32)")[:4])
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"  # Same address on every chain
+
+# Checksummed once at import (to_checksum_address hashes the string every call)
+CTF_ADDRESS_CS = Web3.to_checksum_address(CTF_ADDRESS)
+USDC_ADDRESS_CS = Web3.to_checksum_address(USDC_ADDRESS)
+MULTICALL3_ADDRESS_CS = Web3.to_checksum_address(MULTICALL3_ADDRESS)
+ZERO_BYTES32 = bytes(32)  # parentCollectionId = 0x0
+
+# Resolution is permanent (payoutDenominator goes 0 -> N once), so resolved ids are kept on disk
+# (next to this file, not the CWD; only the most recent RESOLVED_CACHE_MAX ids are kept)
+RESOLVED_CACHE_PATH = getattr(config, 'RESOLVED_CACHE_PATH', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "resolved_conditions.json"))
+RESOLVED_CACHE_MAX = 1000
+UNRESOLVED_RECHECK_SECS = 30  # Re-query an unresolved condition at most this often
+
 # Minimal ABI for redeemPositions
 CTF_ABI = [
     {
@@ -39,46 +73,234 @@ CTF_ABI = [
     }
 ]
 
+# Multicall3.aggregate3: batch many view calls into one eth_call
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"}
+                ],
+                "internalType": "struct Multicall3.Call3[]",
+                "name": "calls",
+                "type": "tuple[]"
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"}
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function"
+    }
+]
+
 class CTFRedeemer:
     def __init__(self):
-        # Use multiple RPC options for reliability
-        rpc_urls = [
-            "https://polygon.llamarpc.com",
-            "https://polygon-bor-rpc.publicnode.com",
-            "https://polygon-rpc.com"
-        ]
-        
-        self.w3 = None
-        for rpc in rpc_urls:
-            try:
-                w3 = Web3(Web3.HTTPProvider(rpc, request_kwargs={'timeout': 30}))
-                if w3.is_connected():
-                    self.w3 = w3
-                    logger.info(f"Connected to RPC: {rpc}")
-                    break
-            except:
-                continue
+        # Keep-alive session shared by the probes, the chosen provider and the rest of the bot
+        self._session = SESSION
         
-        if not self.w3:
+        rpc = self._pick_rpc()
+        if not rpc:
             raise ConnectionError("Failed to connect to any Polygon RPC")
         
+        self.w3 = Web3(Web3.HTTPProvider(rpc, session=self._session, request_kwargs={'timeout': RPC_TIMEOUT}))
+        logger.info(f"Connected to RPC: {rpc}")
+        
         self.account = self.w3.eth.account.from_key(config.PRIVATE_KEY)
         self.ctf = self.w3.eth.contract(
-            address=Web3.to_checksum_address(CTF_ADDRESS),
+            address=CTF_ADDRESS_CS,
             abi=CTF_ABI
         )
+        self._ctf_address = self.ctf.address
+        self.multicall = self.w3.eth.contract(
+            address=MULTICALL3_ADDRESS_CS,
+            abi=MULTICALL3_ABI
+        )
         logger.info(f"CTFRedeemer initialized for address: {self.account.address}")
+        
+        self._resolved = self._load_resolved()
+        self._unresolved_checked = {}
+        
+        # Tx metadata reused across back-to-back redeems (nonce tracked locally between fetches)
+        self._nonce = None
+        self._nonce_ts = 0
+        self._gas_price = 0
+        self._gas_price_ts = 0
+
+    def _probe_rpc(self, rpc: str) -> str:
+        resp = self._session.post(
+            rpc,
+            json={"jsonrpc": "2.0", "method": "eth_blockNumber", "params": [], "id": 1},
+            timeout=RPC_PROBE_TIMEOUT
+        )
+        resp.raise_for_status()
+        if 'result' not in resp.json():
+            raise ValueError(f"bad eth_blockNumber response from {rpc}")
+        return rpc
 
+    def _pick_rpc(self):
+        """Race eth_blockNumber on all RPCs, return the first one that answers (or None)."""
+        executor = ThreadPoolExecutor(max_workers=len(RPC_URLS))
+        try:
+            futures = [executor.submit(self._probe_rpc, rpc) for rpc in RPC_URLS]
+            for future in as_completed(futures):
+                try:
+                    return future.result()
+                except Exception as e:
+                    logger.debug(f"RPC probe failed: {e}")
+            return None
+        finally:
+            # Don't wait for the slower probes
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _load_resolved(self) -> dict:
+        """Resolved ids, oldest first (dict used as an insertion-ordered set)."""
+        try:
+            with open(RESOLVED_CACHE_PATH, 'r') as f:
+                return dict.fromkeys(json.load(f)[-RESOLVED_CACHE_MAX:])
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable {RESOLVED_CACHE_PATH}: {e}")
+            return {}
+
+    def _save_resolved(self):
+        try:
+            os.makedirs(os.path.dirname(RESOLVED_CACHE_PATH), exist_ok=True)
+            with open(RESOLVED_CACHE_PATH, 'w') as f:
+                json.dump(list(self._resolved), f)
+        except Exception as e:
+            logger.warning(f"Could not save resolved conditions: {e}")
+
+    def _mark_resolved(self, key: str):
+        self._resolved[key] = None
+        self._unresolved_checked.pop(key, None)
+        # Evict the oldest ids; their positions were redeemed long ago
+        while len(self._resolved) > RESOLVED_CACHE_MAX:
+            del self._resolved[next(iter(self._resolved))]
+
+    @staticmethod
+    def _condition_key(condition_id: str) -> str:
+        return "0x" + condition_id.lower().replace("0x", "")
+
+    @staticmethod
+    def _payout_calldata(key: str) -> bytes:
+        condition_bytes = bytes.fromhex(key[2:])
+        if len(condition_bytes) != 32:
+            raise ValueError(f"Invalid condition id: {key}")
+        return PAYOUT_DENOMINATOR_SELECTOR + condition_bytes
 
     def is_condition_resolved(self, condition_id: str) -> bool:
         """Check if a condition has been resolved (payout denominator > 0)."""
+        key = self._condition_key(condition_id)
+        if key in self._resolved:
+            return True
+        
+        # Unresolved answers are only trusted for a short while
+        last_check = self._unresolved_checked.get(key)
+        if last_check and time.time() - last_check < UNRESOLVED_RECHECK_SECS:
+            return False
+        
         try:
-            condition_bytes = bytes.fromhex(condition_id.replace("0x", ""))
-            payout_denom = self.ctf.functions.payoutDenominator(condition_bytes).call()
-            return payout_denom > 0
+            raw = self.w3.eth.call({'to': self._ctf_address, 'data': self._payout_calldata(key)})
+            payout_denom = int.from_bytes(raw, 'big')
         except Exception as e:
             logger.error(f"Error checking condition: {e}")
             return False
+        
+        if payout_denom > 0:
+            self._mark_resolved(key)
+            self._save_resolved()
+            return True
+        
+        self._unresolved_checked[key] = time.time()
+        return False
+
+    def check_conditions_resolved(self, condition_ids: list) -> dict:
+        """
+        Check many conditions at once with a single Multicall3 eth_call.
+        Returns {condition_id: resolved}. Uses the same cache as is_condition_resolved.
+        """
+        results = {}
+        to_query = {}
+        now = time.time()
+        for cid in condition_ids:
+            key = self._condition_key(cid)
+            last_check = self._unresolved_checked.get(key)
+            if key in self._resolved:
+                results[cid] = True
+            elif last_check and now - last_check < UNRESOLVED_RECHECK_SECS:
+                results[cid] = False
+            else:
+                to_query.setdefault(key, []).append(cid)
+        
+        if not to_query:
+            return results
+        
+        # A malformed id (bad hex / not 32 bytes) is reported unresolved instead of failing the batch
+        keys = []
+        calls = []
+        for key in to_query:
+            try:
+                calldata = self._payout_calldata(key)
+            except ValueError as e:
+                logger.warning(f"Skipping malformed condition id {key}: {e}")
+                for cid in to_query[key]:
+                    results[cid] = False
+                continue
+            keys.append(key)
+            calls.append((self._ctf_address, True, calldata))
+        
+        if not keys:
+            return results
+        
+        try:
+            responses = self.multicall.functions.aggregate3(calls).call()
+        except Exception as e:
+            logger.warning(f"Multicall failed ({e}), checking conditions one by one")
+            for key in keys:
+                resolved = self.is_condition_resolved(key)
+                for cid in to_query[key]:
+                    results[cid] = resolved
+            return results
+        
+        newly_resolved = False
+        for key, (success, return_data) in zip(keys, responses):
+            payout_denom = int.from_bytes(return_data, 'big') if success and len(return_data) == 32 else 0
+            if payout_denom > 0:
+                self._mark_resolved(key)
+                newly_resolved = True
+            elif success:
+                self._unresolved_checked[key] = now
+            for cid in to_query[key]:
+                results[cid] = payout_denom > 0
+        
+        if newly_resolved:
+            self._save_resolved()
+        return results
+
+    def _next_nonce(self) -> int:
+        if self._nonce is None or time.time() - self._nonce_ts > NONCE_TTL:
+            self._nonce = self.w3.eth.get_transaction_count(self.account.address, 'pending')
+            self._nonce_ts = time.time()
+        return self._nonce
+
+    def _current_gas_price(self) -> int:
+        if time.time() - self._gas_price_ts > GAS_PRICE_TTL:
+            self._gas_price = self.w3.eth.gas_price
+            self._gas_price_ts = time.time()
+        return self._gas_price
 
     def redeem(self, condition_id: str) -> dict:
         """
@@ -92,33 +314,38 @@ class CTFRedeemer:
         """
         try:
             condition_bytes = bytes.fromhex(condition_id.replace("0x", ""))
-            zero_bytes = bytes(32)  # parentCollectionId = 0x0
             
             # Index sets for binary outcomes: [1, 2] covers both Yes and No
             index_sets = [1, 2]
             
             # Build transaction
             tx = self.ctf.functions.redeemPositions(
-                Web3.to_checksum_address(USDC_ADDRESS),
-                zero_bytes,
+                USDC_ADDRESS_CS,
+                ZERO_BYTES32,
                 condition_bytes,
                 index_sets
             ).build_transaction({
                 'from': self.account.address,
-                'nonce': self.w3.eth.get_transaction_count(self.account.address),
+                'nonce': self._next_nonce(),
                 'gas': 200000,
-                'gasPrice': self.w3.eth.gas_price,
+                'gasPrice': self._current_gas_price(),
                 'chainId': 137  # Polygon
             })
             
             # Sign and send
             signed_tx = self.w3.eth.account.sign_transaction(tx, config.PRIVATE_KEY)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            try:
+                tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            except Exception:
+                # Nonce may be stale (e.g. a tx sent elsewhere): re-sync from chain next time
+                self._nonce = None
+                raise
+            self._nonce += 1
             
             logger.info(f"✅ Redeem TX sent: {tx_hash.hex()}")
             
             # Wait for receipt
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=60)
+            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=60, poll_latency=RECEIPT_POLL_LATENCY)
             
             if receipt.status == 1:
                 logger.info(f"🎉 Redeem successful! Block: {receipt.blockNumber}")
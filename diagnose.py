@@ -55,7 +55,7 @@ def diagnose():
             print("❌ Failed to fetch Binance price history.")
             continue
         
-        current_price = history['close'].iloc[-1]
+        current_price = history['close'].iat[-1]
         print(f"💰 Current Binance Price: ${current_price:.2f}")
 
         # 4. Strategy Analysis
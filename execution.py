@@ -1,18 +1,50 @@
 from py_clob_client.client import ClobClient
-from py_clob_client.clob_types import OrderArgs, ApiCreds
+from py_clob_client.clob_types import OrderArgs, ApiCreds, BalanceAllowanceParams, AssetType, OrderType
 from py_clob_client.constants import POLYGON
 import config
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+FINAL_ORDER_STATUSES = ('MATCHED', 'CANCELED', 'EXPIRED')
+
 class ExecutionEngine:
     def __init__(self):
         self.host = config.HOST
         self.chain_id = config.CHAIN_ID
         self.client = self._connect()
+        self._keepalive_stop = None
+
+    def start_keepalive(self, interval: float = 20.0):
+        """
+        Keep the CLOB HTTPS connection warm from a daemon thread: one cheap request
+        now (so the first real call skips the TLS handshake), then every 'interval' seconds.
+        py_clob_client sends every request through one module-level httpx client, so
+        the warmed connection is the one get_order_book/post_order reuse.
+        """
+        if self._keepalive_stop is not None:
+            return
+        self._keepalive_stop = threading.Event()
+        
+        def _keepalive(stop):
+            while not stop.is_set():
+                try:
+                    self.client.get_ok()
+                except Exception as e:
+                    logger.debug(f"CLOB keepalive failed: {e}")
+                stop.wait(interval)
+        
+        threading.Thread(target=_keepalive, args=(self._keepalive_stop,), name="ClobKeepalive", daemon=True).start()
+
+    def stop_keepalive(self):
+        if self._keepalive_stop is not None:
+            self._keepalive_stop.set()
+            self._keepalive_stop = None
 
     def refresh_credentials(self) -> bool:
         """Derive fresh API keys and update the .env file."""
@@ -30,19 +62,39 @@ class ExecutionEngine:
             # Update .env file manually to ensure persistence
             env_path = os.path.join(os.path.dirname(__file__), '.env')
             if os.path.exists(env_path):
-                lines = []
+                unchanged = (
+                    creds.api_key == config.API_KEY
+                    and creds.api_secret == config.API_SECRET
+                    and creds.api_passphrase == config.API_PASSPHRASE
+                )
+                if unchanged:
+                    logger.info(".env already has the current keys.")
+                    return True
+                
                 with open(env_path, 'r') as f:
-                    for line in f:
-                        if any(x in line for x in ["POLYMARKET_API_KEY", "POLYMARKET_SECRET", "POLYMARKET_PASSPHRASE"]):
-                            continue
-                        lines.append(line)
+                    lines = [
+                        line for line in f
+                        if not any(x in line for x in ["POLYMARKET_API_KEY", "POLYMARKET_SECRET", "POLYMARKET_PASSPHRASE"])
+                    ]
+                if lines and not lines[-1].endswith("\n"):
+                    lines[-1] += "\n"
                 
                 lines.append(f"POLYMARKET_API_KEY={creds.api_key}\n")
                 lines.append(f"POLYMARKET_SECRET={creds.api_secret}\n")
                 lines.append(f"POLYMARKET_PASSPHRASE={creds.api_passphrase}\n")
                 
-                with open(env_path, 'w') as f:
+                # Write a temp file next to .env and swap it in, so a crash never leaves a truncated .env
+                # (created owner-only, so the secrets are never readable by others mid-write)
+                tmp_path = env_path + ".tmp"
+                try:
+                    os.unlink(tmp_path)  # A stale temp file would keep its old permissions
+                except FileNotFoundError:
+                    pass
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, 'w') as f:
                     f.writelines(lines)
+                    os.fchmod(f.fileno(), os.stat(env_path).st_mode & 0o777)
+                os.replace(tmp_path, env_path)
                 
                 # Update current config in memory
                 config.API_KEY = creds.api_key
@@ -70,7 +122,6 @@ class ExecutionEngine:
             )
              
              if config.API_KEY and config.API_SECRET and config.API_PASSPHRASE:
-                 from py_clob_client.clob_types import ApiCreds
                  creds = ApiCreds(
                      api_key=config.API_KEY,
                      api_secret=config.API_SECRET,
@@ -80,7 +131,6 @@ class ExecutionEngine:
                  logger.info("Connected with existing credentials")
              else:
                  self.refresh_credentials()
-                 from py_clob_client.clob_types import ApiCreds
                  creds = ApiCreds(
                      api_key=config.API_KEY,
                      api_secret=config.API_SECRET,
@@ -95,7 +145,6 @@ class ExecutionEngine:
 
     def get_balance(self) -> float:
         """Get the USDC (collateral) balance."""
-        from py_clob_client.clob_types import BalanceAllowanceParams, AssetType
         try:
             params = BalanceAllowanceParams(asset_type=AssetType.COLLATERAL)
             resp = self.client.get_balance_allowance(params)
@@ -107,7 +156,6 @@ class ExecutionEngine:
 
     def get_token_balance(self, token_id: str) -> float:
         """Get the share balance for a specific token ID (scaled from raw units)."""
-        from py_clob_client.clob_types import BalanceAllowanceParams, AssetType
         try:
             params = BalanceAllowanceParams(
                 asset_type=AssetType.CONDITIONAL,
@@ -152,7 +200,6 @@ class ExecutionEngine:
             # 1. Sign Order
             signed_order = self.client.create_order(order_args)
             # 2. Post Order
-            from py_clob_client.clob_types import OrderType
             resp = self.client.post_order(signed_order, OrderType.GTC)
             logger.info(f"Order placed: {resp}")
             return resp
@@ -160,6 +207,29 @@ class ExecutionEngine:
             logger.error(f"Failed to place order: {e}")
             return None
 
+    def wait_for_order(self, order_id: str, timeout: float = 180, interval: float = 2.0, max_interval: float = 10.0) -> Optional[str]:
+        """
+        Poll an order until it is matched/cancelled/expired or 'timeout' seconds pass.
+        The poll interval grows from 'interval' up to 'max_interval'.
+        Returns the last seen order status (None if it could never be fetched).
+        """
+        deadline = time.time() + timeout
+        status = None
+        while True:
+            try:
+                order = self.client.get_order(order_id) or {}
+                status = str(order.get('status', '')).upper() or status
+            except Exception as e:
+                logger.debug(f"Could not fetch order {order_id}: {e}")
+            
+            if status in FINAL_ORDER_STATUSES:
+                return status
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return status
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 1.5, max_interval)
+
     def cancel_all(self):
         try:
             self.client.cancel_all()
@@ -167,14 +237,16 @@ class ExecutionEngine:
         except Exception as e:
             logger.error(f"Failed to cancel orders: {e}")
 
-    def redeem_winning_position(self, token_id: str) -> dict:
+    def redeem_winning_position(self, token_id: str, balance: Optional[float] = None) -> dict:
         """
         Redeem a winning position by selling at 0.99 price.
         Polymarket doesn't have a direct redeem API, so we sell winning tokens
         at near-$1 price to effectively cash out.
+        Pass 'balance' if it was already fetched to skip the balance query.
         """
         try:
-            balance = self.get_token_balance(token_id)
+            if balance is None:
+                balance = self.get_token_balance(token_id)
             if balance <= 0:
                 logger.info(f"No balance to redeem for token {token_id[:15]}...")
                 return {"success": True, "message": "No balance"}
@@ -207,9 +279,38 @@ class ExecutionEngine:
         Check multiple token IDs and redeem any with positive balance.
         Returns total USDC recovered.
         """
+        # One order per token, so concurrent sells never touch the same token_id
+        token_ids = list(dict.fromkeys(token_ids))
+        if not token_ids:
+            return 0.0
+        
+        with ThreadPoolExecutor(max_workers=min(8, len(token_ids))) as executor:
+            # 1. Query all balances concurrently
+            balances = list(executor.map(self.get_token_balance, token_ids))
+            # 2. Sell only the tokens we actually hold, also concurrently
+            results = list(executor.map(self.redeem_winning_position, token_ids, balances))
+        
         total_redeemed = 0.0
-        for token_id in token_ids:
-            result = self.redeem_winning_position(token_id)
+        for result in results:
             if result.get('success') and result.get('payout'):
                 total_redeemed += result['payout']
         return total_redeemed
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> ExecutionEngine:
+    """
+    Process-wide ExecutionEngine, connected on first use and reused afterwards.
+    Its CLOB connection is kept warm in the background (start_keepalive).
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = ExecutionEngine()
+                engine.start_keepalive()
+                _engine = engine
+    return _engine
@@ -0,0 +1,23 @@
+"""
+Shared HTTP session
+One pooled keep-alive requests.Session for the live bot's REST traffic
+(Gamma scanner, Binance prices, Polygon RPC via Web3.HTTPProvider).
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def _make_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=16,
+        max_retries=Retry(total=2, backoff_factor=0.2)
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+SESSION = _make_session()
@@ -8,14 +8,33 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def _rolling_mean(values: np.ndarray, period: int) -> np.ndarray:
+    """Trailing rolling mean via prefix sums; first period-1 entries are NaN (like pandas)."""
+    out = np.full(len(values), np.nan)
+    if period <= 0 or len(values) < period:
+        return out
+    cs = np.concatenate(([0.0], np.cumsum(values)))
+    out[period - 1:] = (cs[period:] - cs[:-period]) / period
+    return out
+
+
+def _as_series(values: np.ndarray, like) -> pd.Series:
+    if isinstance(like, pd.Series):
+        return pd.Series(values, index=like.index, name=like.name)
+    return pd.Series(values)
+
+
 def calculate_rsi(close: pd.Series, period: int = 14) -> pd.Series:
     """Calculate Relative Strength Index."""
-    delta = close.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+    arr = np.asarray(close, dtype=np.float64)
+    # First diff is 0 (pandas' NaN diff was filled with 0 by where())
+    delta = np.diff(arr, prepend=arr[:1])
+    gain = _rolling_mean(np.where(delta > 0, delta, 0.0), period)
+    loss = _rolling_mean(np.where(delta < 0, -delta, 0.0), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = gain / loss
+        rsi = 100 - (100 / (1 + rs))
+    return _as_series(rsi, close)
 
 
 def calculate_bollinger_bands(close: pd.Series, period: int = 20, std_dev: int = 2) -> tuple:
@@ -23,11 +42,41 @@ def calculate_bollinger_bands(close: pd.Series, period: int = 20, std_dev: int =
     Calculate Bollinger Bands.
     Returns: (upper_band, middle_band, lower_band)
     """
-    middle = close.rolling(window=period).mean()
-    std = close.rolling(window=period).std()
+    arr = np.asarray(close, dtype=np.float64)
+    n = len(arr)
+    middle = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+    if period > 1 and n >= period:
+        # Center before the prefix sums so sum(x^2) - sum(x)^2/p doesn't lose precision
+        offset = arr.mean()
+        x = arr - offset
+        cs = np.concatenate(([0.0], np.cumsum(x)))
+        cs2 = np.concatenate(([0.0], np.cumsum(x * x)))
+        s = cs[period:] - cs[:-period]
+        s2 = cs2[period:] - cs2[:-period]
+        # Sample variance (ddof=1), same as pandas rolling().std()
+        var = np.maximum((s2 - s * s / period) / (period - 1), 0.0)
+        middle[period - 1:] = s / period + offset
+        std[period - 1:] = np.sqrt(var)
     upper = middle + (std * std_dev)
     lower = middle - (std * std_dev)
-    return upper, middle, lower
+    return _as_series(upper, close), _as_series(middle, close), _as_series(lower, close)
+
+
+def detect_bb_reversal(close: pd.Series, band: pd.Series, direction: int, lookback: int = 3) -> bool:
+    """
+    Band reversal in one pass over the tail.
+    direction=+1: pierced the lower band and closed back above it (bullish).
+    direction=-1: pierced the upper band and closed back below it (bearish).
+    """
+    if len(close) < lookback + 1 or len(band) < lookback + 1:
+        return False
+    
+    # Signed distance outside the band over the last 'lookback' candles (> 0 = closed outside)
+    outside = direction * (np.asarray(band, dtype=np.float64)[-lookback:] - np.asarray(close, dtype=np.float64)[-lookback:])
+    
+    # Current candle is back inside, so only the earlier candles in the window can be the pierce
+    return bool(outside[-1] < 0 and (outside[:-1] > 0).any())
 
 
 def detect_bb_lower_reversal(close: pd.Series, lower_band: pd.Series, lookback: int = 3) -> bool:
@@ -36,38 +85,14 @@ def detect_bb_lower_reversal(close: pd.Series, lower_band: pd.Series, lookback:
     Checks if any of the last 'lookback' candles touched below lower band,
     and the current candle closed above it.
     """
-    if len(close) < lookback + 1 or len(lower_band) < lookback + 1:
-        return False
-    
-    # Check if any recent candle touched below lower band
-    touched_lower = False
-    for i in range(-lookback, 0):
-        if close.iloc[i] < lower_band.iloc[i]:
-            touched_lower = True
-            break
-    
-    # Current candle closed above lower band
-    closed_above = close.iloc[-1] > lower_band.iloc[-1]
-    
-    return touched_lower and closed_above
+    return detect_bb_reversal(close, lower_band, 1, lookback)
 
 
 def detect_bb_upper_reversal(close: pd.Series, upper_band: pd.Series, lookback: int = 3) -> bool:
     """
     Detect bearish reversal: Price pierced upper band and closed back inside.
     """
-    if len(close) < lookback + 1 or len(upper_band) < lookback + 1:
-        return False
-    
-    touched_upper = False
-    for i in range(-lookback, 0):
-        if close.iloc[i] > upper_band.iloc[i]:
-            touched_upper = True
-            break
-    
-    closed_below = close.iloc[-1] < upper_band.iloc[-1]
-    
-    return touched_upper and closed_below
+    return detect_bb_reversal(close, upper_band, -1, lookback)
 
 
 def calculate_spot_change_pct(close: pd.Series, lookback_candles: int = 1) -> float:
@@ -78,8 +103,8 @@ def calculate_spot_change_pct(close: pd.Series, lookback_candles: int = 1) -> fl
     if len(close) < lookback_candles + 1:
         return 0.0
     
-    old_price = close.iloc[-(lookback_candles + 1)]
-    current_price = close.iloc[-1]
+    old_price = close.iat[-(lookback_candles + 1)]
+    current_price = close.iat[-1]
     
     if old_price == 0:
         return 0.0
@@ -93,7 +118,7 @@ def calculate_support_resistance(close: pd.Series, lookback: int = 20) -> tuple:
     Returns (support_level, resistance_level)
     """
     if len(close) < lookback:
-        return close.iloc[-1] * 0.99, close.iloc[-1] * 1.01
+        return close.iat[-1] * 0.99, close.iat[-1] * 1.01
     
     recent = close.iloc[-lookback:]
     support = recent.min()
@@ -0,0 +1,105 @@
+"""
+Numba Indicator Kernels
+Compiled numeric core of SwingStrategy.analyze_market: same math as
+indicators.py, but only the last candle's values, from the tail of the closes.
+Call warmup() once at startup to compile outside the trading loop.
+"""
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def rsi_last(close, period):
+    """RSI of the last candle: mean gain/loss over the last 'period' diffs (the first candle's diff counts as 0)."""
+    n = len(close)
+    if period <= 0 or n < period:
+        return np.nan
+    gain_sum = 0.0
+    loss_sum = 0.0
+    for i in range(n - period, n):
+        d = close[i] - close[i - 1] if i > 0 else 0.0
+        if d > 0:
+            gain_sum += d
+        elif d < 0:
+            loss_sum -= d
+    gain = gain_sum / period
+    loss = loss_sum / period
+    if loss == 0:
+        return 100.0 if gain != 0 else np.nan
+    return 100 - (100 / (1 + gain / loss))
+
+
+@njit(cache=True)
+def bb_last(close, period, std_dev):
+    """Bollinger Bands (sample std) of the last candle. Returns (upper, middle, lower)."""
+    n = len(close)
+    if period <= 1 or n < period:
+        return np.nan, np.nan, np.nan
+    window = close[n - period:]
+    middle = window.sum() / period
+    std = np.sqrt(((window - middle) ** 2).sum() / (period - 1))
+    return middle + std * std_dev, middle, middle - std * std_dev
+
+
+@njit(cache=True)
+def sr_last(close, lookback):
+    """Support/resistance from the last 'lookback' closes. Returns (support, resistance)."""
+    n = len(close)
+    if n < lookback:
+        return close[n - 1] * 0.99, close[n - 1] * 1.01
+    return close[n - lookback:].min(), close[n - lookback:].max()
+
+
+@njit(cache=True)
+def analyze(close, rsi_period, bb_period, std_dev, lookback, sr_lookback):
+    """
+    Indicator values for the last candle, reading only the tail each one needs.
+    Returns (rsi, bb_upper, bb_lower, bb_bullish, bb_bearish, spot_change_pct, support, resistance).
+    """
+    n = len(close)
+    current_price = close[n - 1]
+
+    # 1. RSI
+    rsi = rsi_last(close, rsi_period)
+
+    # 2. Bollinger Bands for the last 'lookback' candles only
+    upper = np.full(lookback, np.nan)
+    lower = np.full(lookback, np.nan)
+    for j in range(lookback):
+        end = n - lookback + 1 + j
+        if end > 0:
+            upper[j], _, lower[j] = bb_last(close[:end], bb_period, std_dev)
+
+    # 3. BB reversals: pierced within the lookback and the current candle is back inside
+    bb_bullish = False
+    bb_bearish = False
+    if n >= lookback + 1:
+        touched_lower = False
+        touched_upper = False
+        for j in range(lookback - 1):
+            c = close[n - lookback + j]
+            if c < lower[j]:
+                touched_lower = True
+            if c > upper[j]:
+                touched_upper = True
+        bb_bullish = touched_lower and current_price > lower[lookback - 1]
+        bb_bearish = touched_upper and current_price < upper[lookback - 1]
+
+    # 4. Spot change over the last candle
+    spot_change = 0.0
+    if n >= 2 and close[n - 2] != 0:
+        spot_change = (current_price - close[n - 2]) / close[n - 2] * 100
+
+    # 5. Support/Resistance from recent lows/highs
+    support, resistance = sr_last(close, sr_lookback)
+
+    return rsi, upper[lookback - 1], lower[lookback - 1], bb_bullish, bb_bearish, spot_change, support, resistance
+
+
+def warmup():
+    """Compile (or load from cache) the kernels so the first live tick doesn't pay for it."""
+    dummy = np.linspace(100.0, 101.0, 30)
+    rsi_last(dummy, 14)
+    bb_last(dummy, 20, 2)
+    sr_last(dummy, 20)
+    analyze(dummy, 14, 20, 2, 3, 20)
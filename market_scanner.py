@@ -1,30 +1,99 @@
-import requests
+import functools
+import json
 import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 import config
+from http_utils import SESSION
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional, stdlib json is just slower
+    _json_loads = json.loads
 
 logger = logging.getLogger(__name__)
 
+PAGE_SIZE = 100
+PAGE_WAVE = 5  # Pages requested concurrently per round (later rounds only run if nothing matched yet)
+CACHE_BUCKET_SECS = 60  # Scan results are reused within the same minute
+CACHE_MAX_AGE_SECS = 300  # Older buckets are dropped on insert
+
+# 15-min interval in the title, e.g. "3:00PM-3:15PM"
+_TIME_RE = re.compile(r'\d{1,2}:\d{2}(?:[apm]{2})?-\d{1,2}:\d{2}(?:[apm]{2})?', re.IGNORECASE)
+
+
+def _parse_end_date(date_str: str) -> datetime:
+    """Gamma ISO timestamp (e.g. '2025-02-03T15:15:00.000Z') -> UTC datetime, whole seconds."""
+    end_date = datetime.fromisoformat(date_str.replace("Z", "+00:00"))
+    if end_date.tzinfo is None:
+        end_date = end_date.replace(tzinfo=timezone.utc)
+    return end_date.replace(microsecond=0)
+
 class MarketScanner:
     def __init__(self):
         self.gamma_url = "https://gamma-api.polymarket.com/events"
+        self.session = SESSION
+        self._page_pool = ThreadPoolExecutor(max_workers=10)
+        self._keywords = {asset: tuple(kw.lower() for kw in cfg['polymarket_keywords']) for asset, cfg in config.ASSETS.items()}
+        # Title marker per asset, from its primary keyword (e.g. "bitcoin up or down")
+        self._markers = {asset: f"{kws[0]} up or down" for asset, kws in self._keywords.items() if kws}
+        self._cache = {}  # (asset, quick_scan, minute bucket) -> (scan time, markets)
+
+    def _fetch_page(self, params: dict):
+        resp = self.session.get(self.gamma_url, params=params, timeout=5)  # 5 second timeout
+        return _json_loads(resp.content)
+
+    def _iter_pages(self, params: dict, max_pages: int):
+        """Yield event pages in offset order, fetching PAGE_WAVE pages at a time concurrently."""
+        for first in range(0, max_pages, PAGE_WAVE):
+            last = min(first + PAGE_WAVE, max_pages)
+            futures = [
+                self._page_pool.submit(self._fetch_page, dict(params, offset=page * PAGE_SIZE))
+                for page in range(first, last)
+            ]
+            for future in futures:
+                yield future.result()
 
     def get_markets_for_asset(self, asset: str, quick_scan=False):
         """
         Find 15-minute up/down markets for a specific asset.
         Returns list of market dicts with clob_token_ids.
+        Results are cached per minute; failed scans are not cached.
         """
+        now_ts = time.time()
+        key = (asset, quick_scan, int(now_ts // CACHE_BUCKET_SECS))
+        cached = self._cache.get(key)
+        if cached is not None:
+            # Drop markets that ended since the scan
+            now = datetime.now(timezone.utc)
+            return [m for m in cached[1] if m['end_date'] >= now]
+        
+        markets = self._scan_markets(asset, quick_scan)
+        if markets is None:
+            return []
+        
+        for old_key, (scanned_at, _) in list(self._cache.items()):
+            if now_ts - scanned_at > CACHE_MAX_AGE_SECS:
+                self._cache.pop(old_key, None)
+        self._cache[key] = (now_ts, markets)
+        return list(markets)
+
+    def _scan_markets(self, asset: str, quick_scan: bool):
+        """Uncached Gamma scan behind get_markets_for_asset. Returns None on request errors."""
         if asset not in config.ASSETS:
             logger.warning(f"Unknown asset: {asset}")
             return []
         
-        keywords = config.ASSETS[asset]['polymarket_keywords']
+        keywords = self._keywords[asset]
         
         try:
             markets_found = []
             
             params = {
-                "limit": 100,
+                "limit": PAGE_SIZE,
                 "active": "true",
                 "closed": "false",
                 "order": "endDate",
@@ -45,21 +114,30 @@ class MarketScanner:
             
             max_pages = 15  # Increased to find current markets
             
-            for page in range(max_pages):
-                resp = requests.get(self.gamma_url, params=params, timeout=5)  # 5 second timeout
-                events = resp.json()
-                
+            # Per-scan constants for the event filters below
+            asset_marker = self._markers.get(asset)
+            if not asset_marker:
+                return []
+            current_day_str = now.strftime("%B %d").lower() # e.g. "february 03"
+            # Remove leading zero for months/days if necessary to match Polymarket style
+            style_date = current_day_str.replace(" 0", " ") 
+            
+            for events in self._iter_pages(params, max_pages):
                 if not events:
                     break
                 
+                # Results are sorted by endDate: once a page starts past the window, every later page does too
+                try:
+                    if _parse_end_date(events[0].get('endDate', '')) > target_window_end:
+                        break
+                except:
+                    pass
+                
                 # Skip if entire batch is in the past
                 last_event_date_str = events[-1].get('endDate', '')
                 try:
-                    le_clean = last_event_date_str.replace("Z", "")
-                    if "." in le_clean: le_clean = le_clean.split(".")[0]
-                    le_date = datetime.strptime(le_clean, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+                    le_date = _parse_end_date(last_event_date_str)
                     if le_date < now:
-                        params['offset'] += 100
                         continue
                 except:
                     pass
@@ -68,32 +146,27 @@ class MarketScanner:
                     title = event.get('title', '').lower()
                     end_date_str = event.get('endDate')
                     
-                    # 1. STRICT ASSET FILTER (Must be BTC or ETH "Up or Down")
-                    asset_marker = "bitcoin up or down" if asset == 'BTC' else "ethereum up or down"
+                    # 1. STRICT ASSET FILTER (Must be "<asset> Up or Down")
                     if asset_marker not in title:
                         continue
                     
                     # 2. STRICT DATE FILTER (Must include current date, e.g., "February 3")
-                    current_day_str = now.strftime("%B %d").lower() # e.g. "february 03"
-                    # Remove leading zero for months/days if necessary to match Polymarket style
-                    style_date = current_day_str.replace(" 0", " ") 
                     if style_date not in title:
                         continue
                     
                     # 3. STRICT 15-MIN INTERVAL FILTER (Minutes 2-12 logic is in bot.py)
-                    import re
-                    time_pattern = r'\d{1,2}:\d{2}(?:[apm]{2})?-\d{1,2}:\d{2}(?:[apm]{2})?'
-                    time_match = re.search(time_pattern, title, re.IGNORECASE)
+                    time_match = _TIME_RE.search(title)
                     
                     if not time_match:
                         continue
                     
+                    if not end_date_str:
+                        continue
+                    
                     logger.info(f"MATCHED: '{title}' Ends: {end_date_str}")
                     
                     try:
-                        clean_date = end_date_str.replace("Z", "")
-                        if "." in clean_date: clean_date = clean_date.split(".")[0]
-                        end_date = datetime.strptime(clean_date, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+                        end_date = _parse_end_date(end_date_str)
                         
                         if target_window_start <= end_date <= target_window_end:
                             for m in event.get('markets', []):
@@ -104,16 +177,15 @@ class MarketScanner:
                                     continue
                                 
                                 # Parse JSON string if needed
-                                import json
                                 if isinstance(clob_token_ids, str):
                                     try:
-                                        clob_token_ids = json.loads(clob_token_ids)
+                                        clob_token_ids = _json_loads(clob_token_ids)
                                     except:
                                         continue
                                 
                                 if isinstance(outcomes, str):
                                     try:
-                                        outcomes = json.loads(outcomes)
+                                        outcomes = _json_loads(outcomes)
                                     except:
                                         outcomes = []
                                 
@@ -139,14 +211,12 @@ class MarketScanner:
                 
                 if markets_found:
                     break
-                    
-                params['offset'] += 100
             
             return markets_found
             
         except Exception as e:
             logger.error(f"Error scanning markets for {asset}: {e}")
-            return []
+            return None
 
     def get_all_asset_markets(self):
         """
@@ -154,10 +224,14 @@ class MarketScanner:
         Returns dict: {asset: [markets]}
         """
         all_markets = {}
+        assets = list(config.ASSETS.keys())
         
-        for asset in config.ASSETS.keys():
-            logger.info(f"Scanning {asset} markets...")
-            markets = self.get_markets_for_asset(asset, quick_scan=True)
+        # Assets are independent: scan them concurrently
+        logger.info(f"Scanning {', '.join(assets)} markets...")
+        with ThreadPoolExecutor(max_workers=len(assets) or 1) as executor:
+            results = executor.map(lambda a: self.get_markets_for_asset(a, quick_scan=True), assets)
+        
+        for asset, markets in zip(assets, results):
             all_markets[asset] = markets
             if markets:
                 logger.info(f"  Found {len(markets)} {asset} market(s)")
@@ -194,6 +268,12 @@ class MarketScanner:
             return False
 
 
+@functools.lru_cache(maxsize=1)
+def get_scanner() -> MarketScanner:
+    """Process-wide MarketScanner, so scripts in one process share its page pool and scan cache."""
+    return MarketScanner()
+
+
 if __name__ == "__main__":
     scanner = MarketScanner()
     all_markets = scanner.get_all_asset_markets()
@@ -0,0 +1,156 @@
+"""
+Binance Kline WebSocket Feed
+Keeps a rolling in-memory DataFrame of 5m candles per symbol, updated from
+the combined kline stream instead of polling the REST API every cycle.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+import pandas as pd
+import websockets
+
+logger = logging.getLogger(__name__)
+
+BINANCE_WS_URL = "wss://stream.binance.com:9443/stream"
+
+
+class BinanceKlineFeed:
+    def __init__(self, symbols: list, seed_fn, interval: str = '5m', max_candles: int = 50, stale_after: float = 60.0):
+        """
+        Args:
+            symbols: Binance symbols (e.g. ['BTCUSDT', 'ETHUSDT'])
+            seed_fn: callable(symbol) -> DataFrame with open_time/open/high/low/close,
+                     used to seed (and re-seed) the history over REST
+            max_candles: Rolling window length kept per symbol
+            stale_after: Seconds without a message before get_history() reports no data
+        """
+        self.symbols = [s.upper() for s in symbols]
+        self.seed_fn = seed_fn
+        self.interval = interval
+        self.max_candles = max_candles
+        self.stale_after = stale_after
+
+        self._lock = threading.Lock()
+        self._df_by_symbol = {}
+        self._last_msg = {}
+        self._needs_seed = set(self.symbols)
+        self._running = False
+        self._thread = None
+        # Set by the stream so the bot loop can wake on new data instead of sleeping
+        self._tick = threading.Event()
+        self._candle_closed = threading.Event()
+
+    def start(self):
+        """Seed history over REST and start the background stream thread."""
+        for symbol in self.symbols:
+            self._seed(symbol)
+
+        self._running = True
+        self._thread = threading.Thread(target=self._thread_main, name="BinanceKlineFeed", daemon=True)
+        self._thread.start()
+        logger.info(f"Kline stream started for {self.symbols} ({self.interval})")
+
+    def stop(self):
+        self._running = False
+        # Wake anyone blocked in wait_for_update
+        self._tick.set()
+        self._candle_closed.set()
+
+    def wait_for_update(self, timeout: float, closed_only: bool = False) -> bool:
+        """
+        Block until the next kline message (or, with closed_only, the next closed
+        candle) or 'timeout' seconds. Updates that arrived since the last call
+        return immediately. Returns True if woken by the stream.
+        """
+        event = self._candle_closed if closed_only else self._tick
+        woke = event.wait(timeout)
+        event.clear()
+        return woke
+
+    def get_history(self, symbol: str):
+        """
+        Copy of the rolling candle DataFrame for a symbol.
+        Returns None if the stream has no fresh data (caller should fall back to REST).
+        """
+        symbol = symbol.upper()
+        with self._lock:
+            df = self._df_by_symbol.get(symbol)
+            last_msg = self._last_msg.get(symbol, 0)
+            if df is None or df.empty or symbol in self._needs_seed:
+                return None
+            if time.time() - last_msg > self.stale_after:
+                return None
+            return df.copy()
+
+    def _seed(self, symbol: str):
+        try:
+            df = self.seed_fn(symbol)
+        except Exception as e:
+            logger.warning(f"Kline seed failed for {symbol}: {e}")
+            return
+        if df is None or df.empty:
+            return
+
+        df = df[['open_time', 'open', 'high', 'low', 'close']].tail(self.max_candles).reset_index(drop=True)
+        with self._lock:
+            self._df_by_symbol[symbol] = df
+            self._last_msg[symbol] = time.time()
+            self._needs_seed.discard(symbol)
+
+    def _apply_kline(self, symbol: str, k: dict):
+        open_time = int(k['t'])
+        ohlc = [float(k['o']), float(k['h']), float(k['l']), float(k['c'])]
+
+        with self._lock:
+            self._last_msg[symbol] = time.time()
+            df = self._df_by_symbol.get(symbol)
+            if df is None or df.empty:
+                return
+
+            last_open = int(df['open_time'].iat[-1])
+            if open_time == last_open:
+                # Still the same candle: overwrite the last row
+                df.iloc[-1, 1:] = ohlc
+            elif open_time > last_open:
+                if open_time - last_open > 5 * 60 * 1000:
+                    # Missed candles (e.g. after a reconnect): re-seed over REST
+                    self._needs_seed.add(symbol)
+                new_row = pd.DataFrame([[open_time] + ohlc], columns=df.columns)
+                self._df_by_symbol[symbol] = pd.concat([df, new_row], ignore_index=True).tail(self.max_candles).reset_index(drop=True)
+            else:
+                return
+
+        self._tick.set()
+        if k.get('x'):
+            self._candle_closed.set()
+
+    def _thread_main(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        streams = "/".join(f"{s.lower()}@kline_{self.interval}" for s in self.symbols)
+        url = f"{BINANCE_WS_URL}?streams={streams}"
+        backoff = 1
+
+        while self._running:
+            try:
+                async with websockets.connect(url, ping_interval=20) as ws:
+                    backoff = 1
+                    async for raw in ws:
+                        if not self._running:
+                            break
+                        msg = json.loads(raw).get('data', {})
+                        if msg.get('e') == 'kline':
+                            self._apply_kline(msg['s'], msg['k'])
+
+                        for symbol in list(self._needs_seed):
+                            await asyncio.to_thread(self._seed, symbol)
+            except Exception as e:
+                logger.warning(f"Kline stream error: {e} (reconnecting in {backoff}s)")
+                with self._lock:
+                    self._needs_seed.update(self.symbols)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
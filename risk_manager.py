@@ -1,17 +1,100 @@
+import json
 import logging
 import config
-from datetime import datetime
+import heapq
 import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from http_utils import SESSION
+
+try:
+    from ctf_redeemer import CTFRedeemer
+except ImportError:  # web3 missing: expired positions are dropped without auto-redeem
+    CTFRedeemer = None
 
 logger = logging.getLogger(__name__)
 
+
+class PositionStore:
+    """
+    Active positions as dicts, plus parallel numpy columns of the fields the
+    monitoring checks read, so TP/SL/expiry run as array ops over all positions.
+    Unset support/resistance levels are NaN (comparisons with NaN are False).
+    """
+    
+    def __init__(self, positions: list = None):
+        self.positions = list(positions or [])
+        # (expiry, token_id) min-heap so cleanup can tell in O(1) that nothing expired.
+        # Entries of positions removed by an exit go stale and are dropped when popped.
+        self._expiry_heap = [(p.get('expiry', 0), p['token_id']) for p in self.positions]
+        heapq.heapify(self._expiry_heap)
+        self._build_columns()
+    
+    def _build_columns(self):
+        ps = self.positions
+        self.entry_price = np.array([p.get('entry_price', 0.0) for p in ps], dtype=np.float64)
+        self.size = np.array([p.get('size', 0) for p in ps], dtype=np.float64)
+        self.shares = np.array([p.get('shares', 0) for p in ps], dtype=np.float64)
+        self.support = np.array([p.get('support_level') or np.nan for p in ps], dtype=np.float64)
+        self.resistance = np.array([p.get('resistance_level') or np.nan for p in ps], dtype=np.float64)
+        self.expiry = np.array([p.get('expiry', 0) for p in ps], dtype=np.float64)
+        sides = [p.get('side', '').upper() for p in ps]
+        self.side_up = np.array([s == 'UP' for s in sides], dtype=bool)
+        self.side_down = np.array([s == 'DOWN' for s in sides], dtype=bool)
+        self.token_ids = [p['token_id'] for p in ps]
+        self.assets = [p['asset'] for p in ps]
+        self.symbols = [p.get('binance_symbol', f"{p['asset']}USDT") for p in ps]
+        self.held_assets = set(self.assets)
+        self.exposure = float(self.size.sum())  # Total USD at risk, read on every trade decision
+    
+    def __len__(self):
+        return len(self.positions)
+    
+    def __iter__(self):
+        return iter(self.positions)
+    
+    def __getitem__(self, i):
+        return self.positions[i]
+    
+    def append(self, position: dict):
+        self.positions.append(position)
+        heapq.heappush(self._expiry_heap, (position.get('expiry', 0), position['token_id']))
+        self._build_columns()
+    
+    def take(self, mask: np.ndarray) -> list:
+        """Positions where mask is True."""
+        return [self.positions[i] for i in np.flatnonzero(mask)]
+    
+    def keep(self, mask: np.ndarray):
+        """Keep only the positions where mask is True."""
+        self.positions = self.take(mask)
+        self._build_columns()
+    
+    def remove_token(self, token_id: str):
+        self.keep(np.array([t != token_id for t in self.token_ids], dtype=bool))
+    
+    def expired_mask(self, cutoff: float):
+        """Mask of positions with expiry <= cutoff, or None if none can be expired."""
+        heap = self._expiry_heap
+        if not heap or heap[0][0] > cutoff:
+            return None
+        while heap and heap[0][0] <= cutoff:
+            heapq.heappop(heap)
+        mask = self.expiry <= cutoff
+        return mask if mask.any() else None
+    
+    def watched_mask(self) -> np.ndarray:
+        """Positions with a support/resistance level to watch."""
+        return ~np.isnan(self.support) | ~np.isnan(self.resistance)
+
+
 class RiskManager:
     """
     Portfolio-level risk management.
     Tracks active positions and enforces capital protection rules.
     
     Position Sizing:
-    - Each position = 5% of current cash
+    - Each position = up to 5% of current cash (fractional Kelly can only shrink it)
     - Max total exposure = 10% (2 positions)
     """
     
@@ -26,23 +109,62 @@ class RiskManager:
         self.position_size_pct = getattr(config, 'POSITION_SIZE_PCT', 0.05)  # 5% per position
         self.max_total_exposure_pct = getattr(config, 'MAX_TOTAL_EXPOSURE_PCT', 0.10)  # 10% max
         self.min_stake = getattr(config, 'MIN_STAKE', 1.0)
+        self.fractional_kelly = getattr(config, 'FRACTIONAL_KELLY', 0.25)  # Kelly sizing safety factor
         
-        self.active_positions = []
+        self.active_positions = PositionStore()
         self.total_pnl = 0.0
         
+        # token_id -> (fetched at, order book); short-lived, shared by TP checks and exits
+        self._book_cache = {}
+        self._tp_unreachable = set()  # token_ids already logged as unable to reach the TP
+        self.book_cache_ttl = 2.0
+        
+        # Monitoring REST calls (order books, Binance prices) are issued concurrently
+        self._io_pool = ThreadPoolExecutor(max_workers=4)
+        
+        # CTFRedeemer created on first auto-redeem and kept, so its resolution cache,
+        # nonce and gas price survive between cleanup passes
+        self._redeemer = None
+        
         logger.info(f"RiskManager: Capital=${self.current_capital}, Position Size={self.position_size_pct*100:.0f}% (${self.current_capital * self.position_size_pct:.2f})")
     
-    def get_position_size(self) -> float:
+    def kelly_fraction(self, win_prob: float, odds: float, fraction: float = None) -> float:
         """
-        Calculate position size as 5% of current cash.
-        Returns the USD amount to bet.
+        Fractional Kelly stake as a fraction of capital for a binary contract,
+        capped at position_size_pct: the strategy's confidence isn't a calibrated
+        probability, so Kelly may only reduce the flat per-position size.
+        
+        Args:
+            win_prob: Estimated probability the bought side wins (0.0 to 1.0)
+            odds: Contract price paid (0.0 to 1.0); net payout per $1 is (1 - odds) / odds
+            fraction: Share of full Kelly to bet (defaults to config.FRACTIONAL_KELLY)
         """
-        size = self.current_capital * self.position_size_pct
-        return max(self.min_stake, size)
+        if fraction is None:
+            fraction = self.fractional_kelly
+        if not 0 < odds < 1:
+            return 0.0
+        b = (1 - odds) / odds
+        k = (b * win_prob - (1 - win_prob)) / b
+        return max(0.0, min(k * fraction, self.position_size_pct))
     
-    def get_dynamic_stake(self) -> float:
+    def get_position_size(self, win_prob: float = None, odds: float = None) -> float:
+        """
+        Calculate position size as 5% of current cash, or fractional Kelly (at most
+        5%, and capped by the remaining exposure room) when win_prob and odds are given.
+        Returns the USD amount to bet (0 if Kelly sees no edge).
+        """
+        if win_prob is None or odds is None:
+            size = self.current_capital * self.position_size_pct
+            return max(self.min_stake, size)
+        
+        exposure_pct = self.get_current_exposure() / self.current_capital if self.current_capital > 0 else 0.0
+        room_pct = max(0.0, self.max_total_exposure_pct - exposure_pct)
+        size = self.current_capital * min(self.kelly_fraction(win_prob, odds), room_pct)
+        return max(self.min_stake, size) if size > 0 else 0.0
+    
+    def get_dynamic_stake(self, win_prob: float = None, odds: float = None) -> float:
         """Alias for get_position_size for backward compatibility."""
-        return self.get_position_size()
+        return self.get_position_size(win_prob, odds)
 
     
     def update_capital(self, pnl: float):
@@ -53,7 +175,7 @@ class RiskManager:
     
     def get_current_exposure(self):
         """Total USD currently at risk."""
-        return sum(p.get('size', 0) for p in self.active_positions)
+        return self.active_positions.exposure
     
     def can_open_position(self, amount: float, asset: str) -> bool:
         """
@@ -78,10 +200,9 @@ class RiskManager:
             return False
         
         # Check if already holding this asset
-        for p in self.active_positions:
-            if p.get('asset') == asset:
-                logger.warning(f"Already holding position in {asset}. Skipping.")
-                return False
+        if asset in self.active_positions.held_assets:
+            logger.warning(f"Already holding position in {asset}. Skipping.")
+            return False
         
         return True
 
@@ -117,16 +238,29 @@ class RiskManager:
             'entry_time': time.time()
         }
         self.active_positions.append(position)
+        self._book_cache.pop(token_id, None)
+        self._tp_unreachable.discard(token_id)
         
-        # Log with support/resistance info
-        sl_info = f"Support: ${support_level:.0f}" if support_level else ""
-        rl_info = f"Resistance: ${resistance_level:.0f}" if resistance_level else ""
-        level_info = sl_info or rl_info
-        
-        logger.info(f"Position recorded: {asset} {side} {shares:.2f} shares @ ${entry_price:.3f} | {level_info}")
+        # Log with support/resistance info (formatted only if INFO is emitted)
+        if logger.isEnabledFor(logging.INFO):
+            sl_info = f"Support: ${support_level:.0f}" if support_level else ""
+            rl_info = f"Resistance: ${resistance_level:.0f}" if resistance_level else ""
+            level_info = sl_info or rl_info
+            
+            logger.info(f"Position recorded: {asset} {side} {position['shares']:.2f} shares @ ${entry_price:.3f} | {level_info}")
+
 
 
 
+    def _get_book(self, engine, token_id: str):
+        """Order book for token_id, reused if fetched less than book_cache_ttl seconds ago."""
+        cached = self._book_cache.get(token_id)
+        now = time.monotonic()
+        if cached and now - cached[0] < self.book_cache_ttl:
+            return cached[1]
+        book = engine.client.get_order_book(token_id)
+        self._book_cache[token_id] = (now, book)
+        return book
 
     def get_take_profit_signals(self, engine) -> list:
         """
@@ -134,29 +268,72 @@ class RiskManager:
         Returns list of positions to sell.
         """
         signals = []
-        for p in self.active_positions:
-            token_id = p['token_id']
-            entry_price = p['entry_price']
-            
+        store = self.active_positions
+        if not len(store):
+            return signals
+        
+        # Prices cap at $1: positions entered too high can never reach the TP, skip their books
+        entry = store.entry_price
+        reachable = entry * (1 + self.take_profit_pct) < 1.0
+        for i in np.flatnonzero(~reachable):
+            token_id = store.token_ids[i]
+            if token_id not in self._tp_unreachable:
+                self._tp_unreachable.add(token_id)
+                logger.info(f"TP unreachable for {store.assets[i]} (entry ${entry[i]:.3f}), not polling its book for TP")
+        
+        # Fetch the remaining books concurrently; exceptions are handled per position below
+        futures = {i: self._io_pool.submit(self._get_book, engine, store.token_ids[i]) for i in np.flatnonzero(reachable)}
+        
+        # Best bid per position (0 = no bids, NaN = not fetched / fetch failed)
+        bids = np.full(len(store), np.nan)
+        for i, future in futures.items():
             try:
-                book = engine.client.get_order_book(token_id)
-                current_price = 0.0
-                if hasattr(book, 'bids') and book.bids:
-                    current_price = float(book.bids[0].price)
-                
-                if current_price > 0:
-                    profit_pct = (current_price - entry_price) / entry_price
-                    if profit_pct >= self.take_profit_pct:
-                        logger.info(f"🔥 TAKE PROFIT TRIGGERED for {p['asset']}: {profit_pct*100:.1f}% gain! (${entry_price:.3f} → ${current_price:.3f})")
-                        p['exit_reason'] = 'TAKE_PROFIT'
-                        p['current_price'] = current_price
-                        signals.append(p)
+                book = future.result()
+                bids[i] = float(book.bids[0].price) if hasattr(book, 'bids') and book.bids else 0.0
             except Exception as e:
-                logger.debug(f"Could not check TP for {token_id}: {e}")
+                logger.debug(f"Could not check TP for {store.token_ids[i]}: {e}")
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            profit = (bids - entry) / entry
+        hit = (bids > 0) & (entry > 0) & (profit >= self.take_profit_pct)
+        
+        for i in np.flatnonzero(hit):
+            p = store[i]
+            entry_price, current_price = entry[i], bids[i]
+            logger.info(f"🔥 TAKE PROFIT TRIGGERED for {p['asset']}: {profit[i]*100:.1f}% gain! (${entry_price:.3f} → ${current_price:.3f})")
+            p['exit_reason'] = 'TAKE_PROFIT'
+            p['current_price'] = float(current_price)
+            signals.append(p)
                 
         return signals
 
-    def get_technical_stop_loss_signals(self) -> list:
+    def _fetch_spot_prices(self, symbols: list) -> dict:
+        """
+        Current Binance spot prices as {symbol: price}, in one request for all symbols.
+        Falls back to one request per symbol if the batch fails (e.g. one unknown symbol).
+        """
+        url = 'https://api.binance.com/api/v3/ticker/price'
+        try:
+            r = SESSION.get(url, params={'symbols': json.dumps(symbols, separators=(',', ':'))}, timeout=5)
+            return {d['symbol']: float(d['price']) for d in r.json()}
+        except Exception as e:
+            logger.debug(f"Batch spot price request failed ({e}), fetching per symbol")
+        
+        prices = {}
+        for symbol in symbols:
+            try:
+                r = SESSION.get(url, params={'symbol': symbol}, timeout=5)
+                prices[symbol] = float(r.json()['price'])
+            except Exception as e:
+                logger.debug(f"Could not fetch spot price for {symbol}: {e}")
+        return prices
+
+    def _watched_symbols(self) -> list:
+        """Binance symbols of positions with a support/resistance level to watch."""
+        store = self.active_positions
+        return sorted({store.symbols[i] for i in np.flatnonzero(store.watched_mask())})
+
+    def get_technical_stop_loss_signals(self, prices: dict = None) -> list:
         """
         Check if underlying asset (BTC/ETH) has broken support/resistance levels.
         This is a TECHNICAL stop loss based on price action, not just % loss.
@@ -164,47 +341,48 @@ class RiskManager:
         For DOWN bets: If price breaks ABOVE resistance, our bet is invalidated
         For UP bets: If price breaks BELOW support, our bet is invalidated
         
+        Pass 'prices' ({symbol: price}) if spot prices were already fetched.
         Returns list of positions to exit.
         """
-        import requests
         signals = []
+        store = self.active_positions
         
-        for p in self.active_positions:
-            side = p.get('side', '').upper()
-            symbol = p.get('binance_symbol', f"{p['asset']}USDT")
-            support = p.get('support_level')
-            resistance = p.get('resistance_level')
-            
-            if not support and not resistance:
-                continue
-            
-            try:
-                # Get current spot price from Binance
-                r = requests.get('https://api.binance.com/api/v3/ticker/price', 
-                                params={'symbol': symbol}, timeout=5)
-                current_spot = float(r.json()['price'])
-                
-                # Check technical invalidation
-                if side == 'DOWN' and resistance:
-                    # If we bet DOWN and price breaks ABOVE resistance, exit
-                    if current_spot > resistance:
-                        pct_above = ((current_spot - resistance) / resistance) * 100
-                        logger.warning(f"🛑 TECH STOP LOSS: {p['asset']} broke resistance ${resistance:.0f}! Current: ${current_spot:.0f} (+{pct_above:.1f}%)")
-                        p['exit_reason'] = 'TECH_SL_RESISTANCE_BREAK'
-                        p['spot_at_exit'] = current_spot
-                        signals.append(p)
-                        
-                elif side == 'UP' and support:
-                    # If we bet UP and price breaks BELOW support, exit
-                    if current_spot < support:
-                        pct_below = ((support - current_spot) / support) * 100
-                        logger.warning(f"🛑 TECH STOP LOSS: {p['asset']} broke support ${support:.0f}! Current: ${current_spot:.0f} (-{pct_below:.1f}%)")
-                        p['exit_reason'] = 'TECH_SL_SUPPORT_BREAK'
-                        p['spot_at_exit'] = current_spot
-                        signals.append(p)
-                        
-            except Exception as e:
-                logger.debug(f"Could not check tech SL for {p['asset']}: {e}")
+        # Only positions with a level to watch need a spot price
+        if not store.watched_mask().any():
+            return signals
+        
+        if prices is None:
+            prices = self._fetch_spot_prices(self._watched_symbols())
+        
+        # DOWN bets watch resistance, UP bets watch support
+        watch_res = store.side_down & ~np.isnan(store.resistance)
+        watch_sup = store.side_up & ~np.isnan(store.support)
+        spots = np.array([prices.get(s, np.nan) for s in store.symbols], dtype=np.float64)
+        
+        for i in np.flatnonzero((watch_res | watch_sup) & np.isnan(spots)):
+            logger.debug(f"Could not check tech SL for {store.assets[i]}: no price for {store.symbols[i]}")
+        
+        # Check technical invalidation (NaN spots compare False)
+        broke_res = watch_res & (spots > store.resistance)
+        broke_sup = watch_sup & (spots < store.support)
+        
+        for i in np.flatnonzero(broke_res | broke_sup):
+            p = store[i]
+            asset, current_spot = store.assets[i], float(spots[i])
+            if broke_res[i]:
+                # If we bet DOWN and price breaks ABOVE resistance, exit
+                resistance = store.resistance[i]
+                pct_above = ((current_spot - resistance) / resistance) * 100
+                logger.warning(f"🛑 TECH STOP LOSS: {asset} broke resistance ${resistance:.0f}! Current: ${current_spot:.0f} (+{pct_above:.1f}%)")
+                p['exit_reason'] = 'TECH_SL_RESISTANCE_BREAK'
+            else:
+                # If we bet UP and price breaks BELOW support, exit
+                support = store.support[i]
+                pct_below = ((support - current_spot) / support) * 100
+                logger.warning(f"🛑 TECH STOP LOSS: {asset} broke support ${support:.0f}! Current: ${current_spot:.0f} (-{pct_below:.1f}%)")
+                p['exit_reason'] = 'TECH_SL_SUPPORT_BREAK'
+            p['spot_at_exit'] = current_spot
+            signals.append(p)
         
         return signals
 
@@ -218,12 +396,16 @@ class RiskManager:
         """
         exit_signals = []
         
+        # Binance prices for the SL check are fetched while the TP check waits on order books
+        symbols = self._watched_symbols()
+        prices_future = self._io_pool.submit(self._fetch_spot_prices, symbols) if symbols else None
+        
         # Check Take Profit
         tp_signals = self.get_take_profit_signals(engine)
         exit_signals.extend(tp_signals)
         
         # Check Technical Stop Loss
-        sl_signals = self.get_technical_stop_loss_signals()
+        sl_signals = self.get_technical_stop_loss_signals(prices=prices_future.result() if prices_future else None)
         # Avoid duplicates
         for sl in sl_signals:
             if sl not in exit_signals:
@@ -246,7 +428,7 @@ class RiskManager:
         
         try:
             # Get best bid
-            book = engine.client.get_order_book(token_id)
+            book = self._get_book(engine, token_id)
             if not hasattr(book, 'bids') or not book.bids:
                 return {'success': False, 'error': 'No bids available'}
             
@@ -270,7 +452,9 @@ class RiskManager:
                 logger.info(f"✅ EXIT COMPLETE: {asset} | P&L: ${pnl:+.2f} ({pnl_pct:+.1f}%)")
                 
                 # Remove from active positions
-                self.active_positions = [p for p in self.active_positions if p['token_id'] != token_id]
+                self.active_positions.remove_token(token_id)
+                self._book_cache.pop(token_id, None)
+                self._tp_unreachable.discard(token_id)
                 
                 return {'success': True, 'pnl': pnl, 'exit_price': best_bid}
             else:
@@ -282,40 +466,56 @@ class RiskManager:
 
 
 
+    def _get_redeemer(self):
+        """Shared CTFRedeemer, created on first use (a failed setup is retried next time)."""
+        if self._redeemer is None:
+            self._redeemer = CTFRedeemer()
+        return self._redeemer
+
     def cleanup_expired_positions(self, current_usdc_balance: float = None):
         """
         Remove positions that have passed their expiry time.
         Attempts CTF redeem for resolved markets.
         If current_usdc_balance is provided, update internal capital tracking.
         """
-        import time
-        now = time.time()
-        initial_count = len(self.active_positions)
+        cutoff = time.time() - 300  # Keep positions still within a small buffer (5 mins) after expiry
         
-        # Separate expired from active positions
-        expired = [p for p in self.active_positions if p.get('expiry', 0) <= (now - 300)]
+        # Split expired from active positions
+        expired_mask = self.active_positions.expired_mask(cutoff)
+        expired = self.active_positions.take(expired_mask) if expired_mask is not None else []
         
         # Attempt to redeem expired positions with condition_id
+        expired_cids = [p['condition_id'] for p in expired if p.get('condition_id')]
+        redeemer = None
+        resolved = {}
+        if expired_cids and CTFRedeemer is not None:
+            try:
+                redeemer = self._get_redeemer()
+                # One multicall for every expired position instead of an RPC per position
+                resolved = redeemer.check_conditions_resolved(expired_cids)
+            except Exception as e:
+                logger.debug(f"Could not check expired positions for auto-redeem: {e}")
+        
         for p in expired:
             cid = p.get('condition_id')
-            if cid:
+            if cid and resolved.get(cid):
                 try:
-                    from ctf_redeemer import CTFRedeemer
-                    redeemer = CTFRedeemer()
-                    if redeemer.is_condition_resolved(cid):
-                        logger.info(f"🎰 Auto-redeeming {p['asset']} position...")
-                        result = redeemer.redeem(cid)
-                        if result.get('success'):
-                            logger.info(f"✅ Auto-redeem successful: {result.get('tx_hash', '')[:20]}...")
-                        else:
-                            logger.warning(f"Auto-redeem failed: {result.get('error')}")
+                    logger.info(f"🎰 Auto-redeeming {p['asset']} position...")
+                    result = redeemer.redeem(cid)
+                    if result.get('success'):
+                        logger.info(f"✅ Auto-redeem successful: {result.get('tx_hash', '')[:20]}...")
+                    else:
+                        logger.warning(f"Auto-redeem failed: {result.get('error')}")
                 except Exception as e:
                     logger.debug(f"Could not auto-redeem {p['asset']}: {e}")
         
-        # Keep only positions that haven't expired or are still within a small buffer (5 mins)
-        self.active_positions = [p for p in self.active_positions if p.get('expiry', 0) > (now - 300)]
+        if expired:
+            self.active_positions.keep(~expired_mask)
+            for p in expired:
+                self._book_cache.pop(p['token_id'], None)
+                self._tp_unreachable.discard(p['token_id'])
         
-        removed = initial_count - len(self.active_positions)
+        removed = len(expired)
         if removed > 0:
             logger.info(f"Cleaned up {removed} expired positions from memory.")
             
@@ -341,5 +541,5 @@ class RiskManager:
             'active_positions': len(self.active_positions),
             'current_exposure': self.get_current_exposure(),
             'current_capital': self.current_capital,
-            'positions': self.active_positions
+            'positions': self.active_positions.positions
         }
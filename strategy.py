@@ -2,17 +2,12 @@
 Swing 15min Strategy
 Combines: Price Divergence + RSI Extremes + Bollinger Bands Confirmation
 """
+import numpy as np
 import pandas as pd
 import config
 import logging
-from indicators import (
-    calculate_rsi,
-    calculate_bollinger_bands,
-    detect_bb_lower_reversal,
-    detect_bb_upper_reversal,
-    calculate_spot_change_pct,
-    calculate_support_resistance
-)
+from indicators import calculate_rsi, calculate_bollinger_bands
+import indicators_numba
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +30,16 @@ class SwingStrategy:
         self.bb_std = 2
         self.divergence_threshold = 10.0  # 10% divergence = value signal
         
+        # Indicator arrays for vectorized_signals, keyed by history fingerprint
+        self._indicator_cache = {}
+        self.indicator_cache_size = 8
+        # Last analyze_market_np indicator tuple, keyed by closes fingerprint
+        self._last_np_key = None
+        self._last_np_indicators = None
+        # Last analyze_market_np result, keyed by closes fingerprint + odds
+        self._cache_key = None
+        self._cache_val = None
+        
         logger.info(f"SwingStrategy for {asset}: RSI<{self.rsi_oversold} for UP, RSI>{self.rsi_overbought} for DOWN")
 
     def calculate_implied_probability(self, spot_change_pct: float) -> float:
@@ -68,6 +73,15 @@ class SwingStrategy:
         Returns:
             dict with signal, confidence, and debug info
         """
+        close = history_df['close'].to_numpy(dtype=np.float64, copy=False) if len(history_df) else np.empty(0)
+        return self.analyze_market_np(close, polymarket_up_odds=polymarket_up_odds)
+
+    def analyze_market_np(self, close: np.ndarray, polymarket_up_odds: float = 0.50) -> dict:
+        """
+        analyze_market on a 1-D ndarray of closes (5m candles, oldest first).
+        Lets callers holding numpy arrays pass cheap views (e.g. closes[:i+1])
+        instead of slicing a DataFrame.
+        """
         result = {
             'signal': 'NEUTRAL',
             'confidence': 0.0,
@@ -76,38 +90,43 @@ class SwingStrategy:
             'divergence': 0.0,
             'bb_reversal': False,
             'support': 0.0,
-            'resistance': 0.0
+            'resistance': 0.0,
+            'bb_upper': 0.0,
+            'bb_lower': 0.0
         }
         
-        if len(history_df) < self.bb_period + 5:
+        if len(close) < self.bb_period + 5:
             return result
         
-        close = history_df['close']
-        current_price = close.iloc[-1]
-        
-        # 1. Calculate RSI
-        rsi = calculate_rsi(close, self.rsi_period)
-        current_rsi = rsi.iloc[-1]
-        result['rsi'] = current_rsi
+        close = np.ascontiguousarray(close, dtype=np.float64)
+        current_price = close[-1]
         
-        # 2. Calculate Bollinger Bands
-        upper_bb, mid_bb, lower_bb = calculate_bollinger_bands(close, self.bb_period, self.bb_std)
+        # Same candles and odds as the last call (polled within a candle): reuse the result
+        key = (len(close), close[0], close[-2], close[-1])
+        cache_key = (key, round(polymarket_up_odds, 4))
+        if cache_key == self._cache_key:
+            return dict(self._cache_val)
         
-        # 3. Detect BB Reversals
-        bb_bullish = detect_bb_lower_reversal(close, lower_bb)
-        bb_bearish = detect_bb_upper_reversal(close, upper_bb)
+        # 1-4, 6. RSI, Bollinger Bands + reversals, spot change, support/resistance
+        # (one compiled call, same math as the indicators.py helpers).
+        # Reused while the closes are unchanged, e.g. with different odds.
+        if key != self._last_np_key:
+            self._last_np_indicators = indicators_numba.analyze(
+                close, self.rsi_period, self.bb_period, self.bb_std, 3, 20
+            )
+            self._last_np_key = key
+        (current_rsi, upper_bb, lower_bb, bb_bullish, bb_bearish,
+         spot_change, support, resistance) = self._last_np_indicators
+        result['rsi'] = current_rsi
+        result['bb_upper'] = upper_bb
+        result['bb_lower'] = lower_bb
         result['bb_reversal'] = bb_bullish or bb_bearish
-        
-        # 4. Calculate Spot Change (last 1 candle = 5 mins)
-        spot_change = calculate_spot_change_pct(close, lookback_candles=1)
         result['spot_change_pct'] = spot_change
         
         # 5. Calculate Divergence
         divergence = self.detect_divergence(spot_change, polymarket_up_odds)
         result['divergence'] = divergence
         
-        # 6. Calculate Support/Resistance
-        support, resistance = calculate_support_resistance(close, lookback=20)
         result['support'] = support
         result['resistance'] = resistance
         
@@ -169,8 +188,95 @@ class SwingStrategy:
         else:
             logger.debug(f"[{self.asset}] Price={current_price:.2f}, RSI={current_rsi:.1f}, Div={divergence:.1f}% -> NEUTRAL")
         
+        self._cache_key = cache_key
+        self._cache_val = dict(result)
         return result
 
+    def _history_fingerprint(self, history_df: pd.DataFrame) -> tuple:
+        """Cheap key identifying a history DataFrame (length + first/last bar)."""
+        close = history_df['close']
+        key = (len(history_df), float(close.iat[0]), float(close.iat[-1]))
+        if 'open_time' in history_df:
+            open_time = history_df['open_time']
+            key += (open_time.iat[0], open_time.iat[-1])
+        return key
+
+    def _vector_indicators(self, history_df: pd.DataFrame) -> dict:
+        """
+        Odds-independent indicator arrays for vectorized_signals.
+        Cached per history fingerprint so parameter sweeps over the same
+        candles (e.g. different polymarket_up_odds) skip the rolling math.
+        """
+        key = self._history_fingerprint(history_df)
+        cached = self._indicator_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        close = history_df['close']
+        lookback = 3
+        
+        # 1. RSI + Bollinger Bands over the whole series
+        rsi = calculate_rsi(close, self.rsi_period)
+        upper_bb, mid_bb, lower_bb = calculate_bollinger_bands(close, self.bb_period, self.bb_std)
+        
+        # 2. BB Reversals: touched the band in the last 'lookback' candles and closed back inside
+        touched_lower = (close < lower_bb).astype(int).rolling(window=lookback).max() > 0
+        touched_upper = (close > upper_bb).astype(int).rolling(window=lookback).max() > 0
+        bb_bullish = touched_lower & (close > lower_bb)
+        bb_bearish = touched_upper & (close < upper_bb)
+        
+        # 3. Spot Change (1 candle)
+        prev_close = close.shift(1)
+        spot_change = (((close - prev_close) / prev_close) * 100).where(prev_close != 0, 0.0)
+        
+        # 4. Support/Resistance (last 20 closes)
+        support = close.rolling(window=20).min()
+        resistance = close.rolling(window=20).max()
+        
+        indicators = {
+            'rsi': rsi.to_numpy(),
+            'bb_bullish': bb_bullish.to_numpy(),
+            'bb_bearish': bb_bearish.to_numpy(),
+            'spot_change': spot_change.to_numpy(),
+            'near_support': ((close - support).abs() / close < 0.005).to_numpy(),
+            'near_resistance': ((close - resistance).abs() / close < 0.005).to_numpy(),
+        }
+        
+        if len(self._indicator_cache) >= self.indicator_cache_size:
+            # Evict the oldest entry
+            self._indicator_cache.pop(next(iter(self._indicator_cache)))
+        self._indicator_cache[key] = indicators
+        return indicators
+
+    def vectorized_signals(self, history_df: pd.DataFrame, polymarket_up_odds: float = 0.50) -> np.ndarray:
+        """
+        Compute the analyze_market signal for every bar in a single pass.
+        
+        Row i matches analyze_market(history_df.iloc[:i+1])['signal'], but all
+        rolling indicators are computed once over the full DataFrame.
+        
+        Returns:
+            np.ndarray of 'UP' / 'DOWN' / 'NEUTRAL' strings, one per row
+        """
+        ind = self._vector_indicators(history_df)
+        rsi = ind['rsi']
+        
+        # 5. Divergence (only part that depends on the odds)
+        divergence = (50.0 + ind['spot_change'] * 10) - polymarket_up_odds * 100
+        
+        # 6. Signal rules (same as analyze_market)
+        oversold = rsi < self.rsi_oversold
+        overbought = ~oversold & (rsi > self.rsi_overbought)
+        up = oversold & ((divergence > self.divergence_threshold) | ind['bb_bullish'] | ind['near_support'])
+        down = overbought & ((divergence < -self.divergence_threshold) | ind['bb_bearish'] | ind['near_resistance'])
+        
+        # analyze_market needs at least bb_period + 5 candles
+        warm = np.arange(len(history_df)) >= self.bb_period + 4
+        up &= warm
+        down &= warm
+        
+        return np.where(up, 'UP', np.where(down, 'DOWN', 'NEUTRAL'))
+
 
 # Alias for backwards compatibility
 SniperStrategy = SwingStrategy
@@ -1,4 +1,4 @@
-from execution import ExecutionEngine
+from execution import get_engine
 from py_clob_client.client import ClobClient
 import config
 import logging
@@ -8,7 +8,7 @@ logging.basicConfig(level=logging.INFO)
 def test():
     print("Testing connection...")
     try:
-        engine = ExecutionEngine()
+        engine = get_engine()
         print("ClobClient created.")
         
         # Try to fetch balance/collateral
@@ -1,9 +1,9 @@
 
-from market_scanner import MarketScanner
+from market_scanner import get_scanner
 import logging
 
 logging.basicConfig(level=logging.INFO)
-scanner = MarketScanner()
+scanner = get_scanner()
 
 print("Testing Market Scanner Filter...")
 markets = scanner.get_all_asset_markets()
@@ -1,6 +1,10 @@
-import requests
-import json
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from http_utils import SESSION
+
+try:
+    import ijson  # Optional: stream-parse pages and stop at the first match
+except ImportError:
+    ijson = None
 
 def test_gamma():
     # Gamma API endpoint
@@ -18,30 +22,51 @@ def test_gamma():
     
     print(f"Fetching from {url}...")
     
-    found_today = False
+    offsets = range(0, 1000, 100)  # Scan up to 1000 markets
     
-    try:
-        while not found_today and params['offset'] < 1000: # Scan up to 1000 markets
-            print(f"  Fetching offset {params['offset']}...")
-            r = requests.get(url, params=params)
+    def fetch(offset):
+        """Returns (events parsed, first event ending on the target date or None)."""
+        r = SESSION.get(url, params={**params, "offset": offset}, headers={"Accept": "application/json"}, timeout=5, stream=True)
+        with r:
             r.raise_for_status()
-            data = r.json()
+            if ijson is not None:
+                r.raw.decode_content = True
+                events = ijson.items(r.raw, 'item')
+            else:
+                events = r.json()
+            
+            count = 0
+            for item in events:
+                count += 1
+                end_date_str = item.get('endDate')
+                if end_date_str and '2026-02-03' in end_date_str:
+                    return count, item
+            return count, None
+    
+    # All pages are requested at once; results are still scanned in offset order
+    pool = ThreadPoolExecutor(max_workers=len(offsets))
+    try:
+        futures = []
+        for offset in offsets:
+            print(f"  Fetching offset {offset}...")
+            futures.append(pool.submit(fetch, offset))
+        
+        for future in futures:
+            count, item = future.result()
             
-            if not data:
+            if not count:
                 print("No more data.")
                 break
-                
-            for item in data:
-                end_date_str = item.get('endDate')
-                if not end_date_str: continue
-                if '2026-02-03' in end_date_str:
-                    print(f"FOUND MATCHING DATE: {item.get('title')} | {end_date_str}")
-                    found_today = True
             
-            params['offset'] += 100
+            if item:
+                print(f"FOUND MATCHING DATE: {item.get('title')} | {item.get('endDate')}")
+                break
             
     except Exception as e:
         print(f"Error: {e}")
+    finally:
+        # Drop pages not needed after a match / empty page / error
+        pool.shutdown(wait=False, cancel_futures=True)
 
 if __name__ == "__main__":
     test_gamma()
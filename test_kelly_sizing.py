@@ -0,0 +1,60 @@
+"""
+Kelly Sizing Test - Offline check that bot entries are Kelly-sized (never above the flat 5%)
+"""
+import logging
+import bot
+from risk_manager import RiskManager
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def make_risk_manager(capital: float = 1000.0) -> RiskManager:
+    rm = RiskManager()
+    rm.current_capital = capital
+    return rm
+
+
+def test_bot_entry_uses_kelly_stake():
+    rm = make_risk_manager()
+
+    # b = (1 - 0.5) / 0.5 = 1 -> full Kelly 0.1 -> 1/4 Kelly = 2.5% of $1000
+    stake = bot.get_entry_stake(rm, {'signal': 'UP', 'confidence': 0.55}, best_ask=0.5)
+    assert abs(stake - 25.0) < 1e-6, stake
+    assert stake < rm.get_dynamic_stake()
+
+
+def test_high_confidence_stays_within_position_size():
+    rm = make_risk_manager()
+    flat = rm.get_dynamic_stake()
+
+    # Strategy confidence 0.85 at even odds would be 17.5% with 1/4 Kelly: capped at the flat 5%
+    stake = bot.get_entry_stake(rm, {'signal': 'UP', 'confidence': 0.85}, best_ask=0.5)
+    assert abs(stake - flat) < 1e-6, stake
+    assert stake <= rm.current_capital * rm.position_size_pct + 1e-9
+
+    # ...so a second asset still fits under the max exposure
+    rm.record_position('BTC', 'UP', stake, 'tok-btc', 'order-1', 0.5, shares=stake / 0.5)
+    second = bot.get_entry_stake(rm, {'signal': 'UP', 'confidence': 0.85}, best_ask=0.5)
+    assert rm.can_open_position(second, 'ETH')
+
+
+def test_bot_entry_no_edge_is_zero():
+    rm = make_risk_manager()
+    # 40% confidence at even odds has negative edge
+    assert bot.get_entry_stake(rm, {'signal': 'UP', 'confidence': 0.4}, best_ask=0.5) == 0.0
+
+
+def test_kelly_stake_limited_to_exposure_room():
+    rm = make_risk_manager()
+    rm.record_position('BTC', 'UP', 80.0, 'tok-btc', 'order-1', 0.5, shares=160)
+    # 10% cap = $100, $80 already at risk -> $20 room
+    stake = bot.get_entry_stake(rm, {'signal': 'UP', 'confidence': 0.9}, best_ask=0.5)
+    assert abs(stake - 20.0) < 1e-6, stake
+
+
+if __name__ == "__main__":
+    test_bot_entry_uses_kelly_stake()
+    test_high_confidence_stays_within_position_size()
+    test_bot_entry_no_edge_is_zero()
+    test_kelly_stake_limited_to_exposure_room()
+    print("Kelly sizing OK")
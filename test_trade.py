@@ -1,9 +1,58 @@
 """
 Quick Trade Test - Uses cached market data, no API search needed
 """
+import json
+import os
 import time
-from execution import ExecutionEngine
-from market_scanner import MarketScanner
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from py_clob_client.clob_types import BookParams
+from execution import FINAL_ORDER_STATUSES, get_engine
+from market_scanner import get_scanner
+
+LAST_TOKENS_PATH = os.path.join(".cache", "last_btc_tokens.txt")
+MARKETS_CACHE_PATH = os.path.join(".cache", "markets_btc_quick.json")
+MARKETS_CACHE_TTL = 300  # Reuse a scan from the last 5 minutes across runs
+
+
+def best_ask_of(book, default=0.50):
+    if hasattr(book, 'asks') and book.asks:
+        return float(book.asks[0].price)
+    return default
+
+
+def fetch_books(token_ids):
+    """Order books for all token_ids in one batch request."""
+    return engine.client.get_order_books([BookParams(token_id=t) for t in token_ids])
+
+
+def find_btc_markets(scanner):
+    """BTC quick-scan markets, from the disk cache if fresh (ended markets dropped)."""
+    now = datetime.now(timezone.utc)
+    try:
+        with open(MARKETS_CACHE_PATH) as f:
+            cached = json.load(f)
+        if time.time() - cached['scanned_at'] < MARKETS_CACHE_TTL:
+            markets = []
+            for m in cached['markets']:
+                m['end_date'] = datetime.fromisoformat(m['end_date'])
+                if m['end_date'] >= now:
+                    markets.append(m)
+            if markets:
+                return markets
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    markets = scanner.get_markets_for_asset('BTC', quick_scan=True)
+    if markets:
+        try:
+            os.makedirs(os.path.dirname(MARKETS_CACHE_PATH), exist_ok=True)
+            with open(MARKETS_CACHE_PATH, 'w') as f:
+                json.dump({'scanned_at': time.time(), 'markets': markets}, f, default=lambda d: d.isoformat())
+        except (OSError, TypeError) as e:
+            print(f"(Could not cache markets: {e})", end=" ", flush=True)
+    return markets
+
 
 print("=" * 50)
 print("QUICK TRADE TEST")
@@ -12,14 +61,24 @@ print("=" * 50)
 # 1. Initialize (this should take < 3 seconds)
 start = time.time()
 print("Connecting to Polymarket...", end=" ", flush=True)
-engine = ExecutionEngine()
+engine = get_engine()
 print(f"Done ({time.time()-start:.1f}s)")
 
-# 2. Get current BTC market from scanner
+# 2. Get current BTC market from scanner, while speculatively fetching the
+#    orderbooks of the tokens seen last run (usually still the same market)
 print("Finding BTC market...", end=" ", flush=True)
 start = time.time()
-scanner = MarketScanner()
-markets = scanner.get_markets_for_asset('BTC', quick_scan=True)
+try:
+    with open(LAST_TOKENS_PATH) as f:
+        cached_tokens = f.read().split()
+except OSError:
+    cached_tokens = []
+
+pool = ThreadPoolExecutor(max_workers=2)
+scanner = get_scanner()
+markets_future = pool.submit(find_btc_markets, scanner)
+books_future = pool.submit(fetch_books, cached_tokens) if cached_tokens else None
+markets = markets_future.result()
 print(f"Done ({time.time()-start:.1f}s)")
 
 if not markets:
@@ -38,17 +97,42 @@ if len(token_ids) < 1:
 up_token = token_ids[0]
 print(f"UP Token: {up_token[:20]}...")
 
-# 4. Get orderbook and best ask
-print("Getting orderbook...", end=" ", flush=True)
+try:
+    os.makedirs(os.path.dirname(LAST_TOKENS_PATH), exist_ok=True)
+    with open(LAST_TOKENS_PATH, 'w') as f:
+        f.write("\n".join(token_ids))
+except OSError as e:
+    print(f"(Could not cache token ids: {e})")
+
+# 4. Get every outcome's orderbook in one request (reuse the speculative fetch if the tokens match)
+print("Getting orderbooks...", end=" ", flush=True)
 start = time.time()
-book = engine.client.get_order_book(up_token)
+books = None
+if books_future and cached_tokens == token_ids:
+    try:
+        books = books_future.result()
+    except Exception as e:
+        print(f"(prefetch failed: {e})", end=" ", flush=True)
+if books is None:
+    books = fetch_books(token_ids)
+pool.shutdown(wait=False)
 print(f"Done ({time.time()-start:.1f}s)")
 
-if hasattr(book, 'asks') and book.asks:
-    best_ask = float(book.asks[0].price)
-else:
-    best_ask = 0.50
+# Books are matched to tokens by asset_id; the response order isn't guaranteed
+by_id = {b.asset_id: b for b in books}
+outcomes = market.get('outcomes') or []
+for asset_id, b in by_id.items():
+    if asset_id not in token_ids:
+        continue
+    i = token_ids.index(asset_id)
+    label = outcomes[i] if i < len(outcomes) else f"Token {i}"
+    print(f"  {label} best ask: ${best_ask_of(b):.3f}")
+
+if up_token not in by_id:
+    print("ERROR: No orderbook returned for the UP token!")
+    exit(1)
 
+best_ask = best_ask_of(by_id[up_token])
 print(f"Best Ask: ${best_ask:.3f}")
 
 # 5. Place minimum buy order
@@ -74,17 +158,17 @@ print(f"\nResult: {resp}")
 if resp and resp.get('success'):
     order_id = resp.get('orderID', 'unknown')
     print(f"\n✅ ORDER PLACED! ID: {order_id}")
-    print(f"\nWaiting 3 minutes before selling...")
+    print(f"\nWaiting up to 3 minutes for the order to fill...")
     
-    # Wait 3 minutes
-    for i in range(180, 0, -30):
-        print(f"  {i}s remaining...")
-        time.sleep(30)
+    # Poll the order; stops early once it is matched/cancelled/expired
+    status = engine.wait_for_order(order_id, timeout=180)
+    print(f"Order status: {status}")
     
     # Sell (cancel order or place sell)
-    print("Cancelling order...")
-    cancel_resp = engine.cancel_order(order_id)
-    print(f"Cancel result: {cancel_resp}")
+    if status not in FINAL_ORDER_STATUSES:
+        print("Cancelling order...")
+        cancel_resp = engine.client.cancel(order_id)
+        print(f"Cancel result: {cancel_resp}")
 else:
     print(f"\n❌ ORDER FAILED: {resp}")
 
@@ -3,7 +3,7 @@ ULTRA FAST TRADE TEST - Fixed Token ID
 """
 import time
 import os
-from execution import ExecutionEngine
+from execution import FINAL_ORDER_STATUSES, get_engine
 
 # OID identified manually for February 3, 11:30AM-11:45AM ET
 # Question: Will Bitcoin be above $103,425.00 at 11:45 AM ET? (Estimated)
@@ -13,26 +13,32 @@ print("=" * 50)
 print("ULTRA FAST TRADE TEST")
 print("=" * 50)
 
+# Timings are collected and printed after the order is placed, so terminal
+# output doesn't land inside the measured intervals
+timings = []
 start_time = time.time()
 
+def mark(label):
+    timings.append((time.time() - start_time, label))
+
 # 1. Initialize
-print(f"[{time.time()-start_time:.2f}s] Connecting...", end=" ", flush=True)
-engine = ExecutionEngine()
-print(f"Done")
+mark("Connecting...")
+engine = get_engine()
+mark("Connected")
 
 # 2. Get orderbook
-print(f"[{time.time()-start_time:.2f}s] Getting best price...", end=" ", flush=True)
+mark("Getting best price...")
 book = engine.client.get_order_book(TOKEN_ID)
 if hasattr(book, 'asks') and book.asks:
     best_ask = float(book.asks[0].price)
 else:
     best_ask = 0.50
-print(f"Done (${best_ask:.3f})")
+mark(f"Best ask ${best_ask:.3f}")
 
 # 3. Buy $1 worth (approx 1 share if price is ~0.50)
 # Minimum 1 share required by Polymarket CLOB normally
 size = 2.0 
-print(f"[{time.time()-start_time:.2f}s] Placing order: BUY {size} YES @ ${best_ask:.3f}...", end=" ", flush=True)
+mark(f"Placing order: BUY {size} YES @ ${best_ask:.3f}...")
 
 resp = engine.place_order(
     token_id=TOKEN_ID,
@@ -40,6 +46,10 @@ resp = engine.place_order(
     price=best_ask,
     size=size
 )
+mark("Order response")
+
+for elapsed, label in timings:
+    print(f"[{elapsed:.2f}s] {label}")
 
 if resp and resp.get('success'):
     order_id = resp.get('orderID', 'unknown')
@@ -47,14 +57,16 @@ if resp and resp.get('success'):
     print(f"Order ID: {order_id}")
     print("\nVerifique seu dashboard no Polymarket agora!")
     
-    print(f"\nWaiting 3 minutes before selling...")
-    time.sleep(180)
+    print(f"\nWaiting up to 3 minutes for the order to fill...")
+    status = engine.wait_for_order(order_id, timeout=180)
+    print(f"Order status: {status}")
     
-    print("\nSelling/Cancelling...")
     # In a limit order context, if it didn't fill yet, we cancel. 
     # If it filled, we'd need to sell. For a test, a cancel or a 1-cent sell is enough.
-    cancel_resp = engine.client.cancel_order(order_id)
-    print(f"Result: {cancel_resp}")
+    if status not in FINAL_ORDER_STATUSES:
+        print("\nSelling/Cancelling...")
+        cancel_resp = engine.client.cancel(order_id)
+        print(f"Result: {cancel_resp}")
 else:
     print(f"\n\n❌ FAILED: {resp}")
 